@@ -0,0 +1,591 @@
+"""Gera datasets de fine-tuning (LoRA) a partir do corpus ja indexado.
+
+Os chunks sao lidos em paginas do Chroma ou de um snapshot completo (ver
+``index_snapshot``; as geracoes publicadas servem), viram exemplos
+contexto/pergunta/resposta no formato de ``DEFAULT_PROMPT`` e sao
+tokenizados em paralelo. O resultado e gravado em shards Arrow
+(``datasets.Dataset.save_to_disk``), lidos depois via memory map.
+
+A memoria fica limitada a um shard em construcao mais algumas paginas em
+tokenizacao. O ``manifest.json`` registra os shards concluidos e quantos
+chunks ja foram consumidos; uma execucao interrompida continua do ultimo
+shard gravado.
+
+Perguntas e respostas vem de um arquivo JSONL (``{"chunk_id", "question",
+"answer"}`` por linha), copiado uma vez para um indice SQLite por
+``chunk_id`` no diretorio de saida: cada pagina consulta apenas os seus
+pares, sem carregar o arquivo inteiro. Chunks sem pares ficam fora do
+dataset. Exemplos extrativos (a mesma pergunta generica para todo trecho,
+respondida com o seu inicio) so sao gerados com ``extractive=True``/
+``--extractive``: o modelo aprende a copiar o comeco do contexto, nao a
+responder perguntas.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import sqlite3
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain.docstore.document import Document
+
+try:  # compatibilidade ao importar via "backend.core" ou diretamente de "core"
+    from backend.core.index_snapshot import IndexSnapshot
+    from backend.core.llm_generator import DEFAULT_PROMPT, build_context
+except ModuleNotFoundError:  # pragma: no cover - caminho utilizado na execucao direta
+    from core.index_snapshot import IndexSnapshot  # type: ignore
+    from core.llm_generator import DEFAULT_PROMPT, build_context  # type: ignore
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_FORMAT = 1
+QA_INDEX_FILE = "qa_pairs.sqlite3"
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+_SHARD_PATTERN = re.compile(r"^shard-\d{5}(\.tmp)?$")
+_SQL_BATCH = 500
+_QA_INSERT_BATCH = 10000
+
+# {"id": ..., "text": ..., "source": ...}
+Chunk = Dict[str, Any]
+QAPairs = Dict[str, List[Tuple[str, str]]]
+
+
+class DatasetBuildError(ValueError):
+    """Configuracao incompativel com o dataset existente ou fonte invalida."""
+
+
+class ChromaChunkSource:
+    """Pagina os chunks de uma colecao do Chroma por offset.
+
+    O offset so e estavel se nao houver escritas durante a geracao; para
+    corpora grandes prefira um snapshot.
+    """
+
+    def __init__(self, collection: Any, location: str) -> None:
+        self.collection = collection
+        self.location = location
+
+    def describe(self) -> Dict[str, Any]:
+        return {"kind": "chroma", "path": self.location}
+
+    def iter_pages(self, start: int, page_size: int) -> Iterator[List[Chunk]]:
+        offset = start
+        while True:
+            page = self.collection.get(
+                include=["documents", "metadatas"], limit=page_size, offset=offset
+            )
+            if not page["ids"]:
+                return
+            yield [
+                {"id": vector_id, "text": text, "source": (metadata or {}).get("source", "")}
+                for vector_id, text, metadata in zip(
+                    page["ids"], page["documents"], page["metadatas"]
+                )
+            ]
+            offset += len(page["ids"])
+
+
+class SnapshotChunkSource:
+    """Pagina os registros de um snapshot completo (imutavel, offsets estaveis)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.snapshot = IndexSnapshot(path, verify=False)
+        if self.snapshot.kind != "full":
+            self.snapshot.close()
+            raise DatasetBuildError("use um snapshot completo (ou uma geracao publicada)")
+
+    def describe(self) -> Dict[str, Any]:
+        return {"kind": "snapshot", "path": self.path, "checksum": self.snapshot.checksum}
+
+    def iter_pages(self, start: int, page_size: int) -> Iterator[List[Chunk]]:
+        for offset in range(start, self.snapshot.count, page_size):
+            end = min(offset + page_size, self.snapshot.count)
+            page = []
+            for index in range(offset, end):
+                record = self.snapshot.record(index)
+                source = (record.get("metadata") or {}).get("source", "")
+                page.append({"id": record["id"], "text": record["text"], "source": source})
+            yield page
+
+    def close(self) -> None:
+        self.snapshot.close()
+
+
+class QAPairIndex:
+    """Pares pergunta/resposta de um JSONL, indexados por ``chunk_id`` em SQLite.
+
+    O JSONL e lido em streaming e so e copiado de novo quando seu tamanho
+    ou data de modificacao mudam; :meth:`lookup` devolve apenas os pares
+    de uma pagina de chunks, na ordem do arquivo.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._conn = sqlite3.connect(path)
+
+    @classmethod
+    def build(cls, qa_file: str, path: str) -> "QAPairIndex":
+        stat = os.stat(qa_file)
+        stamp = f"{os.path.abspath(qa_file)}:{stat.st_size}:{stat.st_mtime_ns}"
+        if cls._stamp(path) != stamp:
+            tmp_path = f"{path}.tmp"
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            conn = sqlite3.connect(tmp_path)
+            try:
+                conn.executescript(
+                    "CREATE TABLE pairs (chunk_id TEXT NOT NULL, line INTEGER NOT NULL, "
+                    "question TEXT NOT NULL, answer TEXT NOT NULL);"
+                    "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+                )
+                batch: List[Tuple[str, int, str, str]] = []
+                for row in cls._read(qa_file):
+                    batch.append(row)
+                    if len(batch) >= _QA_INSERT_BATCH:
+                        conn.executemany("INSERT INTO pairs VALUES (?, ?, ?, ?)", batch)
+                        batch = []
+                conn.executemany("INSERT INTO pairs VALUES (?, ?, ?, ?)", batch)
+                conn.execute("CREATE INDEX idx_pairs_chunk_id ON pairs (chunk_id, line)")
+                conn.execute("INSERT INTO meta (key, value) VALUES ('source', ?)", (stamp,))
+                conn.commit()
+            finally:
+                conn.close()
+            os.replace(tmp_path, path)
+        return cls(path)
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[str]:
+        if not os.path.exists(path):
+            return None
+        conn = sqlite3.connect(path)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        except sqlite3.DatabaseError:
+            return None
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    @staticmethod
+    def _read(qa_file: str) -> Iterator[Tuple[str, int, str, str]]:
+        with open(qa_file, "r", encoding="utf-8") as handle:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    yield item["chunk_id"], line_number, item["question"], item["answer"]
+                except (ValueError, KeyError) as exc:
+                    raise DatasetBuildError(
+                        f"{qa_file}:{line_number}: par invalido ({exc})"
+                    ) from exc
+
+    def lookup(self, chunk_ids: Sequence[str]) -> QAPairs:
+        pairs: QAPairs = {}
+        unique = list(dict.fromkeys(chunk_ids))
+        for start in range(0, len(unique), _SQL_BATCH):
+            batch = unique[start : start + _SQL_BATCH]
+            placeholders = ",".join("?" for _ in batch)
+            rows = self._conn.execute(
+                "SELECT chunk_id, question, answer FROM pairs "
+                f"WHERE chunk_id IN ({placeholders}) ORDER BY line",
+                batch,
+            )
+            for chunk_id, question, answer in rows:
+                pairs.setdefault(chunk_id, []).append((question, answer))
+        return pairs
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def build_examples(
+    chunks: Sequence[Chunk], qa_pairs: QAPairs, max_context_chars: int, extractive: bool = False
+) -> List[Dict[str, str]]:
+    """Gera exemplos (prompt preenchido + resposta) para uma pagina de chunks."""
+    examples = []
+    for chunk in chunks:
+        text = (chunk["text"] or "").strip()
+        if not text:
+            continue
+        pairs = qa_pairs.get(chunk["id"])
+        if not pairs:
+            if not extractive:
+                continue
+            pairs = [_extractive_pair(text, chunk["source"])]
+        context = build_context(
+            [Document(page_content=text, metadata={"source": chunk["source"]})],
+            max_context_chars,
+        )
+        for question, answer in pairs:
+            examples.append(
+                {
+                    "chunk_id": chunk["id"],
+                    "source": chunk["source"],
+                    "question": question,
+                    "answer": answer,
+                    "prompt": DEFAULT_PROMPT.format(context=context, question=question.strip()),
+                }
+            )
+    return examples
+
+
+def _extractive_pair(text: str, source: str) -> Tuple[str, str]:
+    sentences = _SENTENCE_PATTERN.split(text)
+    answer = " ".join(sentences[:2]).strip()
+    origin = f"do documento {source}" if source else "deste documento"
+    return f"Qual e o ponto principal do trecho {origin}?", answer
+
+
+# Tokenizer do processo auxiliar, carregado uma unica vez pelo initializer
+_WORKER_TOKENIZER: Any = None
+
+
+def _init_worker(tokenizer_name: str) -> None:
+    global _WORKER_TOKENIZER
+    from transformers import AutoTokenizer
+
+    _WORKER_TOKENIZER = AutoTokenizer.from_pretrained(tokenizer_name)
+
+
+def tokenize_examples(
+    tokenizer: Any,
+    examples: List[Dict[str, str]],
+    task: str,
+    max_source_length: int,
+    max_target_length: int,
+) -> Dict[str, List[Any]]:
+    """Tokeniza exemplos para seq2seq (``text2text-generation``) ou causal LM.
+
+    No modo causal, prompt e resposta formam uma unica sequencia e os
+    rotulos do prompt sao mascarados com -100.
+    """
+    prompts = [example["prompt"] for example in examples]
+    answers = [example["answer"] for example in examples]
+    sources = tokenizer(prompts, truncation=True, max_length=max_source_length)["input_ids"]
+    targets = tokenizer(
+        answers, truncation=True, max_length=max_target_length, add_special_tokens=False
+    )["input_ids"]
+
+    input_ids, labels = [], []
+    eos = [tokenizer.eos_token_id] if tokenizer.eos_token_id is not None else []
+    for source_ids, target_ids in zip(sources, targets):
+        target_ids = list(target_ids)[: max_target_length - len(eos)] + eos
+        if task == "text2text-generation":
+            input_ids.append(list(source_ids))
+            labels.append(target_ids)
+        else:
+            input_ids.append(list(source_ids) + target_ids)
+            labels.append([-100] * len(source_ids) + target_ids)
+
+    columns: Dict[str, List[Any]] = {
+        key: [example[key] for example in examples]
+        for key in ("chunk_id", "source", "question", "answer")
+    }
+    columns["input_ids"] = input_ids
+    columns["attention_mask"] = [[1] * len(ids) for ids in input_ids]
+    columns["labels"] = labels
+    return columns
+
+
+def _tokenize_in_worker(
+    examples: List[Dict[str, str]], task: str, max_source_length: int, max_target_length: int
+) -> Dict[str, List[Any]]:
+    return tokenize_examples(
+        _WORKER_TOKENIZER, examples, task, max_source_length, max_target_length
+    )
+
+
+def _features() -> Any:
+    from datasets import Features, Sequence as FeatureSequence, Value
+
+    return Features(
+        {
+            "chunk_id": Value("string"),
+            "source": Value("string"),
+            "question": Value("string"),
+            "answer": Value("string"),
+            "input_ids": FeatureSequence(Value("int32")),
+            "attention_mask": FeatureSequence(Value("int8")),
+            "labels": FeatureSequence(Value("int32")),
+        }
+    )
+
+
+class DatasetBuilder:
+    """Gera e retoma datasets em shards no diretorio ``output_dir``."""
+
+    def __init__(
+        self,
+        output_dir: str,
+        tokenizer_name: str,
+        task: str = "text2text-generation",
+        shard_size: int = 10000,
+        page_size: int = 512,
+        workers: int = 0,
+        max_source_length: int = 512,
+        max_target_length: int = 128,
+        max_context_chars: int = 6000,
+        qa_file: Optional[str] = None,
+        extractive: bool = False,
+    ) -> None:
+        self.output_dir = output_dir
+        self.tokenizer_name = tokenizer_name
+        self.task = task
+        self.shard_size = max(shard_size, 1)
+        self.page_size = max(page_size, 1)
+        self.workers = max(workers, 0)
+        self.max_source_length = max_source_length
+        self.max_target_length = max_target_length
+        self.max_context_chars = max_context_chars
+        self.qa_file = qa_file
+        self.extractive = extractive
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.output_dir, MANIFEST_FILE)
+
+    def _config(self) -> Dict[str, Any]:
+        # Mudar qualquer um destes valores invalidaria os shards ja gravados
+        return {
+            "tokenizer": self.tokenizer_name,
+            "task": self.task,
+            "max_source_length": self.max_source_length,
+            "max_target_length": self.max_target_length,
+            "max_context_chars": self.max_context_chars,
+            "qa_file": os.path.abspath(self.qa_file) if self.qa_file else None,
+            "extractive": self.extractive,
+            "prompt": DEFAULT_PROMPT,
+        }
+
+    def _load_manifest(self, source: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as handle:
+                manifest = json.load(handle)
+        except FileNotFoundError:
+            return {
+                "format": MANIFEST_FORMAT,
+                "source": source,
+                "config": self._config(),
+                "chunks_consumed": 0,
+                "examples": 0,
+                "shards": [],
+                "complete": False,
+            }
+        if manifest.get("source") != source or manifest.get("config") != self._config():
+            raise DatasetBuildError(
+                f"{self.output_dir} foi gerado com outra fonte ou configuracao; "
+                "use outro diretorio de saida"
+            )
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            json.dump(manifest, handle, ensure_ascii=False, indent=2)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.manifest_path)
+
+    def _remove_unlisted_shards(self, manifest: Dict[str, Any]) -> None:
+        """Apaga shards parciais ou gravados apos o ultimo manifesto."""
+        listed = {shard["name"] for shard in manifest["shards"]}
+        for name in os.listdir(self.output_dir):
+            if _SHARD_PATTERN.match(name) and name not in listed:
+                shutil.rmtree(os.path.join(self.output_dir, name), ignore_errors=True)
+
+    def _write_shard(
+        self, manifest: Dict[str, Any], columns: Dict[str, List[Any]], chunks_consumed: int
+    ) -> None:
+        from datasets import Dataset
+
+        name = f"shard-{len(manifest['shards']):05d}"
+        final_path = os.path.join(self.output_dir, name)
+        tmp_path = f"{final_path}.tmp"
+        count = len(columns["input_ids"])
+        Dataset.from_dict(columns, features=_features()).save_to_disk(tmp_path)
+        os.replace(tmp_path, final_path)
+
+        manifest["shards"].append(
+            {
+                "name": name,
+                "examples": count,
+                "chunks": [manifest["chunks_consumed"], chunks_consumed],
+            }
+        )
+        manifest["chunks_consumed"] = chunks_consumed
+        manifest["examples"] += count
+        self._write_manifest(manifest)
+        self.logger.info("Shard %s gravado (%d exemplos, %d chunks).", name, count, chunks_consumed)
+
+    def build(self, source: Any) -> Dict[str, Any]:
+        if not self.qa_file and not self.extractive:
+            raise DatasetBuildError(
+                "informe um arquivo de perguntas e respostas (--qa) ou habilite "
+                "explicitamente os exemplos extrativos (--extractive)"
+            )
+        if self.extractive:
+            self.logger.warning(
+                "Exemplos extrativos habilitados: chunks sem pares recebem sempre a mesma "
+                "pergunta generica e o modelo tende a apenas copiar o inicio do contexto."
+            )
+        os.makedirs(self.output_dir, exist_ok=True)
+        manifest = self._load_manifest(source.describe())
+        if manifest["complete"]:
+            return manifest
+        self._remove_unlisted_shards(manifest)
+        if manifest["chunks_consumed"]:
+            self.logger.info("Retomando apos %d chunks.", manifest["chunks_consumed"])
+
+        qa_index = (
+            QAPairIndex.build(self.qa_file, os.path.join(self.output_dir, QA_INDEX_FILE))
+            if self.qa_file
+            else None
+        )
+        columns: Dict[str, List[Any]] = {}
+        consumed = manifest["chunks_consumed"]
+        try:
+            for page_size, tokenized in self._tokenized_pages(source, consumed, qa_index):
+                consumed += page_size
+                for key, values in tokenized.items():
+                    columns.setdefault(key, []).extend(values)
+                if columns and len(columns["input_ids"]) >= self.shard_size:
+                    self._write_shard(manifest, columns, consumed)
+                    columns = {}
+        finally:
+            if qa_index is not None:
+                qa_index.close()
+
+        if columns and columns["input_ids"]:
+            self._write_shard(manifest, columns, consumed)
+        manifest["chunks_consumed"] = consumed
+        manifest["complete"] = True
+        self._write_manifest(manifest)
+        return manifest
+
+    def _page_examples(
+        self, chunks: List[Chunk], qa_index: Optional[QAPairIndex]
+    ) -> List[Dict[str, str]]:
+        qa_pairs = qa_index.lookup([chunk["id"] for chunk in chunks]) if qa_index else {}
+        return build_examples(chunks, qa_pairs, self.max_context_chars, self.extractive)
+
+    def _tokenized_pages(
+        self, source: Any, start: int, qa_index: Optional[QAPairIndex]
+    ) -> Iterator[Tuple[int, Dict[str, List[Any]]]]:
+        """Produz ``(chunks na pagina, colunas tokenizadas)`` na ordem da fonte."""
+        options = (self.task, self.max_source_length, self.max_target_length)
+        pages = (
+            (len(chunks), self._page_examples(chunks, qa_index))
+            for chunks in source.iter_pages(start, self.page_size)
+        )
+        if not self.workers:
+            from transformers import AutoTokenizer
+
+            tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+            for count, examples in pages:
+                yield count, tokenize_examples(tokenizer, examples, *options) if examples else {}
+            return
+
+        # Janela limitada de paginas em voo: Pool.imap consumiria a fonte inteira
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(
+            self.workers, initializer=_init_worker, initargs=(self.tokenizer_name,)
+        ) as pool:
+            in_flight: "deque[Tuple[int, Any]]" = deque()
+            for count, examples in pages:
+                in_flight.append(
+                    (count, pool.apply_async(_tokenize_in_worker, (examples, *options)))
+                    if examples
+                    else (count, None)
+                )
+                if len(in_flight) >= self.workers * 2:
+                    count, result = in_flight.popleft()
+                    yield count, result.get() if result is not None else {}
+            while in_flight:
+                count, result = in_flight.popleft()
+                yield count, result.get() if result is not None else {}
+
+
+def load_shards(output_dir: str) -> Any:
+    """Abre os shards gravados como um unico ``Dataset`` (memory map, sem copia)."""
+    from datasets import concatenate_datasets, load_from_disk
+
+    with open(os.path.join(output_dir, MANIFEST_FILE), "r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    shards = [
+        load_from_disk(os.path.join(output_dir, shard["name"])) for shard in manifest["shards"]
+    ]
+    if not shards:
+        raise DatasetBuildError(f"{output_dir} nao possui shards")
+    return concatenate_datasets(shards)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Gera um dataset de fine-tuning a partir do corpus indexado."
+    )
+    parser.add_argument("output", help="diretorio dos shards (reutilize-o para retomar)")
+    parser.add_argument("--snapshot", help="snapshot completo/geracao usado como fonte")
+    parser.add_argument("--qa", help="JSONL com chunk_id, question e answer")
+    parser.add_argument(
+        "--extractive",
+        action="store_true",
+        help="gera exemplos extrativos (pergunta generica) para chunks sem pares no --qa",
+    )
+    parser.add_argument("--tokenizer", default=os.getenv("RAG_LLM_MODEL", "google/flan-t5-base"))
+    parser.add_argument("--task", default=os.getenv("RAG_LLM_TASK", "text2text-generation"))
+    parser.add_argument("--shard-size", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--max-source-length", type=int, default=512)
+    parser.add_argument("--max-target-length", type=int, default=128)
+    parser.add_argument(
+        "--max-context-chars",
+        type=int,
+        default=int(os.getenv("RAG_LLM_MAX_CONTEXT_CHARS", "6000")),
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.snapshot:
+        source: Any = SnapshotChunkSource(args.snapshot)
+    else:
+        from langchain_community.vectorstores import Chroma
+
+        location = os.path.join(os.getenv("RAG_DATA_DIR", "./data"), "chroma_db")
+        collection = Chroma(persist_directory=location)._collection
+        source = ChromaChunkSource(collection, os.path.abspath(location))
+
+    builder = DatasetBuilder(
+        args.output,
+        args.tokenizer,
+        task=args.task,
+        shard_size=args.shard_size,
+        page_size=args.page_size,
+        workers=args.workers,
+        max_source_length=args.max_source_length,
+        max_target_length=args.max_target_length,
+        max_context_chars=args.max_context_chars,
+        qa_file=args.qa,
+        extractive=args.extractive,
+    )
+    try:
+        manifest = builder.build(source)
+    finally:
+        if isinstance(source, SnapshotChunkSource):
+            source.close()
+    print(
+        f"{args.output}: {manifest['examples']} exemplos em {len(manifest['shards'])} shard(s), "
+        f"{manifest['chunks_consumed']} chunks"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+"""Catalogo local (SQLite) dos documentos indexados no vector store."""
+from __future__ import annotations
+
+import os
+import sqlite3
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+STATUS_PENDING = "pending"
+STATUS_INDEXED = "indexed"
+STATUS_DELETING = "deleting"
+
+# Um vetor pode ser referenciado por chunks de varios documentos
+# (texto normalizado identico e armazenado uma unica vez).
+Fingerprint = Tuple[str, bytes, Sequence[str]]
+# (vector_id, digest do texto normalizado)
+TextDigest = Tuple[str, str]
+_SQL_BATCH = 500
+_INSTANCE_KEY = "instance"
+_REVISION_KEY = "revision"
+CHANGE_VECTOR = "vector"
+CHANGE_DOCUMENT = "document"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    size_bytes INTEGER,
+    page_count INTEGER,
+    chunk_count INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    doc_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    vector_id TEXT NOT NULL,
+    PRIMARY KEY (doc_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_vector_id ON chunks (vector_id);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    vector_id TEXT PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprint_bands (
+    bucket TEXT NOT NULL,
+    vector_id TEXT NOT NULL,
+    PRIMARY KEY (bucket, vector_id)
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_bands_vector_id ON fingerprint_bands (vector_id);
+CREATE TABLE IF NOT EXISTS text_digests (
+    vector_id TEXT PRIMARY KEY,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_text_digests_digest ON text_digests (digest);
+CREATE TABLE IF NOT EXISTS pending_purges (
+    vector_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    revision INTEGER NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS idx_changes_revision ON changes (revision);
+"""
+
+
+class DocumentCatalog:
+    """Mapeia doc_id -> fonte, ids dos vetores e metadados do upload.
+
+    O catalogo e a fonte de verdade para listagens e remocoes: os ids dos
+    vetores ficam registrados explicitamente, evitando filtros ``where`` que
+    varrem a colecao inteira. Cada escrita no vector store e envolvida por
+    um estado intermediario (``pending``/``deleting``) gravado antes da
+    operacao; se o processo cair no meio do caminho, :meth:`incomplete`
+    devolve o que precisa ser desfeito na proxima inicializacao.
+
+    Cada escrita no vector store tambem registra, em :meth:`record_changes`,
+    os vetores e documentos afetados com uma revisao crescente; snapshots
+    incrementais usam :meth:`changes_since` em vez de comparar o indice
+    inteiro com a base.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)",
+                (_INSTANCE_KEY, uuid.uuid4().hex),
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Uma conexao por operacao: seguro entre threads e processos.
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def begin(
+        self,
+        doc_id: str,
+        source: str,
+        vector_ids: Sequence[str],
+        size_bytes: Optional[int] = None,
+        page_count: Optional[int] = None,
+        fingerprints: Sequence[Fingerprint] = (),
+        digests: Sequence[TextDigest] = (),
+    ) -> None:
+        """Registra (ou substitui) um documento em estado ``pending``.
+
+        ``vector_ids`` pode repetir ou apontar para vetores de outros
+        documentos; ``fingerprints`` registra as assinaturas dos vetores
+        novos como ``(vector_id, assinatura, buckets_lsh)`` e ``digests`` o
+        digest do texto normalizado de cada um.
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            conn.execute(
+                "INSERT OR REPLACE INTO documents "
+                "(doc_id, source, size_bytes, page_count, chunk_count, status, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                (doc_id, source, size_bytes, page_count, len(vector_ids), STATUS_PENDING),
+            )
+            conn.executemany(
+                "INSERT INTO chunks (doc_id, position, vector_id) VALUES (?, ?, ?)",
+                [(doc_id, position, vector_id) for position, vector_id in enumerate(vector_ids)],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (vector_id, signature) VALUES (?, ?)",
+                [(vector_id, signature) for vector_id, signature, _ in fingerprints],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO fingerprint_bands (bucket, vector_id) VALUES (?, ?)",
+                [
+                    (bucket, vector_id)
+                    for vector_id, _, buckets in fingerprints
+                    for bucket in buckets
+                ],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO text_digests (vector_id, digest) VALUES (?, ?)",
+                list(digests),
+            )
+
+    def commit(self, doc_id: str) -> None:
+        """Marca o documento como indexado apos a escrita no vector store."""
+        self.commit_many([doc_id])
+
+    def commit_many(self, doc_ids: Sequence[str]) -> None:
+        """Confirma varios documentos em uma unica transacao (group commit)."""
+        if not doc_ids:
+            return
+        indexed_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE documents SET status = ?, indexed_at = ? WHERE doc_id = ?",
+                [(STATUS_INDEXED, indexed_at, doc_id) for doc_id in doc_ids],
+            )
+
+    def mark_deleting(self, doc_id: str) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE documents SET status = ? WHERE doc_id = ?",
+                (STATUS_DELETING, doc_id),
+            )
+            return cursor.rowcount > 0
+
+    def remove(self, doc_id: str, released_vector_ids: Sequence[str] = ()) -> None:
+        """Remove o documento e as assinaturas dos vetores que deixaram de existir.
+
+        Os vetores liberados ficam registrados em ``pending_purges`` ate que
+        :meth:`clear_purges` confirme sua remocao do vector store.
+        """
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO pending_purges (vector_id) VALUES (?)",
+                [(vector_id,) for vector_id in released_vector_ids],
+            )
+            conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            for table in ("fingerprint_bands", "fingerprints", "text_digests"):
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE vector_id = ?",
+                    [(vector_id,) for vector_id in released_vector_ids],
+                )
+
+    def pending_purges(self) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT vector_id FROM pending_purges").fetchall()
+        return [row["vector_id"] for row in rows]
+
+    def clear_purges(self, vector_ids: Sequence[str]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM pending_purges WHERE vector_id = ?",
+                [(vector_id,) for vector_id in vector_ids],
+            )
+
+    def release_plan(
+        self, doc_id: str, ignore_doc_ids: Iterable[str] = ()
+    ) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """Separa os vetores do documento entre exclusivos e compartilhados.
+
+        Retorna ``(orfaos, compartilhados)``: os orfaos podem ser apagados do
+        vector store; cada compartilhado vem acompanhado de outro documento
+        que continua referenciando o vetor (``doc_id``, ``position``,
+        ``source``), usado para reatribuir os metadados. Referencias vindas
+        de ``ignore_doc_ids`` (removidos no mesmo lote) nao contam.
+        """
+        ignored = set(ignore_doc_ids)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT c.vector_id, o.doc_id, o.position, d.source "
+                "FROM chunks c "
+                "JOIN chunks o ON o.vector_id = c.vector_id AND o.doc_id != c.doc_id "
+                "JOIN documents d ON d.doc_id = o.doc_id "
+                "WHERE c.doc_id = ? ORDER BY o.doc_id, o.position",
+                (doc_id,),
+            ).fetchall()
+        shared: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            if row["doc_id"] in ignored:
+                continue
+            shared.setdefault(
+                row["vector_id"],
+                {"doc_id": row["doc_id"], "position": row["position"], "source": row["source"]},
+            )
+        orphans = list(dict.fromkeys(v for v in self.vector_ids(doc_id) if v not in shared))
+        return orphans, shared
+
+    def find_candidates(self, buckets: Iterable[str]) -> Dict[str, List[Tuple[str, bytes]]]:
+        """Busca vetores ja indexados que compartilham algum bucket LSH."""
+        bucket_list = list(dict.fromkeys(buckets))
+        candidates: Dict[str, List[Tuple[str, bytes]]] = {}
+        with self._connect() as conn:
+            for start in range(0, len(bucket_list), _SQL_BATCH):
+                batch = bucket_list[start : start + _SQL_BATCH]
+                placeholders = ",".join("?" for _ in batch)
+                rows = conn.execute(
+                    "SELECT b.bucket, f.vector_id, f.signature "
+                    "FROM fingerprint_bands b JOIN fingerprints f USING (vector_id) "
+                    f"WHERE b.bucket IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                for row in rows:
+                    candidates.setdefault(row["bucket"], []).append(
+                        (row["vector_id"], bytes(row["signature"]))
+                    )
+        return candidates
+
+    def find_exact(self, digests: Iterable[str]) -> Dict[str, str]:
+        """Mapeia digest -> vetor ja indexado com o mesmo texto normalizado."""
+        digest_list = list(dict.fromkeys(digests))
+        matches: Dict[str, str] = {}
+        with self._connect() as conn:
+            for start in range(0, len(digest_list), _SQL_BATCH):
+                batch = digest_list[start : start + _SQL_BATCH]
+                placeholders = ",".join("?" for _ in batch)
+                rows = conn.execute(
+                    "SELECT digest, MIN(vector_id) AS vector_id FROM text_digests "
+                    f"WHERE digest IN ({placeholders}) GROUP BY digest",
+                    batch,
+                ).fetchall()
+                matches.update((row["digest"], row["vector_id"]) for row in rows)
+        return matches
+
+    def known_vector_ids(self, vector_ids: Sequence[str]) -> Set[str]:
+        """Quais dos ``vector_ids`` ja sao referenciados por algum documento."""
+        known: Set[str] = set()
+        with self._connect() as conn:
+            for start in range(0, len(vector_ids), _SQL_BATCH):
+                batch = list(vector_ids[start : start + _SQL_BATCH])
+                placeholders = ",".join("?" for _ in batch)
+                rows = conn.execute(
+                    f"SELECT DISTINCT vector_id FROM chunks WHERE vector_id IN ({placeholders})",
+                    batch,
+                ).fetchall()
+                known.update(row["vector_id"] for row in rows)
+        return known
+
+    def vectors_without_digest(self) -> List[str]:
+        """Vetores referenciados que ainda nao tem digest do texto."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT c.vector_id FROM chunks c "
+                "LEFT JOIN text_digests t ON t.vector_id = c.vector_id "
+                "WHERE t.vector_id IS NULL ORDER BY c.vector_id"
+            ).fetchall()
+        return [row["vector_id"] for row in rows]
+
+    def add_digests(self, digests: Sequence[TextDigest]) -> None:
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO text_digests (vector_id, digest) VALUES (?, ?)",
+                list(digests),
+            )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row is not None else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def revision(self) -> Tuple[str, int]:
+        """Identificador desta instancia do indice e sua revisao atual."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, value FROM meta WHERE key IN (?, ?)", (_INSTANCE_KEY, _REVISION_KEY)
+            ).fetchall()
+        values = {row["key"]: row["value"] for row in rows}
+        return values[_INSTANCE_KEY], int(values.get(_REVISION_KEY, 0))
+
+    def record_changes(self, vector_ids: Iterable[str] = (), doc_ids: Iterable[str] = ()) -> int:
+        """Marca vetores e documentos como alterados em uma nova revisao.
+
+        Deve ser chamado antes da escrita correspondente no vector store:
+        uma mudanca registrada e nao aplicada apenas reenvia o estado atual
+        no proximo delta.
+        """
+        entries = [(CHANGE_VECTOR, key) for key in dict.fromkeys(vector_ids)]
+        entries += [(CHANGE_DOCUMENT, key) for key in dict.fromkeys(doc_ids)]
+        if not entries:
+            return self.revision()[1]
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (_REVISION_KEY,)).fetchone()
+            revision = (int(row["value"]) if row is not None else 0) + 1
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (_REVISION_KEY, str(revision)),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO changes (kind, key, revision) VALUES (?, ?, ?)",
+                [(kind, key, revision) for kind, key in entries],
+            )
+        return revision
+
+    def changes_since(self, revision: int) -> Tuple[List[str], List[str]]:
+        """Vetores e documentos alterados depois de ``revision``."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT kind, key FROM changes WHERE revision > ? ORDER BY key", (revision,)
+            ).fetchall()
+        vector_ids = [row["key"] for row in rows if row["kind"] == CHANGE_VECTOR]
+        doc_ids = [row["key"] for row in rows if row["kind"] == CHANGE_DOCUMENT]
+        return vector_ids, doc_ids
+
+    def vector_ids(self, doc_id: str) -> List[str]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT vector_id FROM chunks WHERE doc_id = ? ORDER BY position",
+                (doc_id,),
+            ).fetchall()
+        return [row["vector_id"] for row in rows]
+
+    def get(self, doc_id: str, include_pending: bool = False) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            if row is None or (row["status"] != STATUS_INDEXED and not include_pending):
+                return None
+            chunk_rows = conn.execute(
+                "SELECT vector_id FROM chunks WHERE doc_id = ? ORDER BY position",
+                (doc_id,),
+            ).fetchall()
+        document = self._row_to_dict(row)
+        document["chunk_ids"] = [chunk["vector_id"] for chunk in chunk_rows]
+        return document
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """Lista apenas documentos completamente indexados."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM documents WHERE status = ? ORDER BY indexed_at, doc_id",
+                (STATUS_INDEXED,),
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def incomplete(self) -> List[Tuple[str, List[str]]]:
+        """Documentos que ficaram no meio de uma escrita (``pending``/``deleting``)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT doc_id FROM documents WHERE status != ?", (STATUS_INDEXED,)
+            ).fetchall()
+        return [(row["doc_id"], self.vector_ids(row["doc_id"])) for row in rows]
+
+    def export_state(
+        self,
+        doc_ids: Optional[Sequence[str]] = None,
+        vector_ids: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Any]:
+        """Exporta documentos indexados e assinaturas para snapshots.
+
+        ``doc_ids``/``vector_ids`` restringem a exportacao (snapshots delta).
+        """
+        if doc_ids is None:
+            documents = []
+            for document in self.list_documents():
+                document["chunk_ids"] = self.vector_ids(document["doc_id"])
+                documents.append(document)
+        else:
+            documents = [doc for doc in map(self.get, doc_ids) if doc is not None]
+
+        with self._connect() as conn:
+            fingerprint_rows = self._select_by_vector(
+                conn, "SELECT vector_id, signature FROM fingerprints", vector_ids
+            )
+            bucket_rows = self._select_by_vector(
+                conn, "SELECT vector_id, bucket FROM fingerprint_bands", vector_ids
+            )
+            digest_rows = self._select_by_vector(
+                conn, "SELECT vector_id, digest FROM text_digests", vector_ids
+            )
+        buckets: Dict[str, List[str]] = {}
+        for row in sorted(bucket_rows, key=lambda row: (row["vector_id"], row["bucket"])):
+            buckets.setdefault(row["vector_id"], []).append(row["bucket"])
+        fingerprints = [
+            [row["vector_id"], bytes(row["signature"]).hex(), buckets.get(row["vector_id"], [])]
+            for row in sorted(fingerprint_rows, key=lambda row: row["vector_id"])
+        ]
+        digests = [
+            [row["vector_id"], row["digest"]]
+            for row in sorted(digest_rows, key=lambda row: row["vector_id"])
+        ]
+        return {"documents": documents, "fingerprints": fingerprints, "digests": digests}
+
+    @staticmethod
+    def _select_by_vector(
+        conn: sqlite3.Connection, query: str, vector_ids: Optional[Sequence[str]]
+    ) -> List[sqlite3.Row]:
+        if vector_ids is None:
+            return conn.execute(query).fetchall()
+        rows: List[sqlite3.Row] = []
+        for start in range(0, len(vector_ids), _SQL_BATCH):
+            batch = list(vector_ids[start : start + _SQL_BATCH])
+            placeholders = ",".join("?" for _ in batch)
+            rows.extend(conn.execute(f"{query} WHERE vector_id IN ({placeholders})", batch))
+        return rows
+
+    def clear(self) -> None:
+        """Esvazia o catalogo; os vetores catalogados vao para ``pending_purges``.
+
+        O indice passa a ser outra instancia: deltas calculados contra
+        snapshots anteriores deixam de usar o historico de revisoes.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO pending_purges (vector_id) "
+                "SELECT DISTINCT vector_id FROM chunks"
+            )
+            for table in (
+                "chunks",
+                "documents",
+                "fingerprint_bands",
+                "fingerprints",
+                "text_digests",
+                "changes",
+            ):
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (_INSTANCE_KEY, uuid.uuid4().hex),
+            )
+            conn.execute("DELETE FROM meta WHERE key = ?", (_REVISION_KEY,))
+
+    def restore(
+        self,
+        documents: Sequence[Dict[str, Any]],
+        fingerprints: Sequence[Sequence[Any]] = (),
+        deleted_documents: Sequence[str] = (),
+        digests: Sequence[Sequence[str]] = (),
+        replaced_vector_ids: Sequence[str] = (),
+    ) -> None:
+        """Aplica o estado exportado por :meth:`export_state` (ou um delta dele).
+
+        ``replaced_vector_ids`` sao os vetores removidos ou regravados pelo
+        snapshot: suas assinaturas antigas sao descartadas antes da carga.
+        """
+        with self._connect() as conn:
+            for table in ("fingerprint_bands", "fingerprints", "text_digests"):
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE vector_id = ?",
+                    [(vector_id,) for vector_id in replaced_vector_ids],
+                )
+            for doc_id in list(deleted_documents) + [doc["doc_id"] for doc in documents]:
+                conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+                conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+            for document in documents:
+                conn.execute(
+                    "INSERT INTO documents "
+                    "(doc_id, source, size_bytes, page_count, chunk_count, status, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        document["doc_id"],
+                        document["source"],
+                        document.get("size_bytes"),
+                        document.get("page_count"),
+                        len(document["chunk_ids"]),
+                        STATUS_INDEXED,
+                        document.get("indexed_at"),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO chunks (doc_id, position, vector_id) VALUES (?, ?, ?)",
+                    [
+                        (document["doc_id"], position, vector_id)
+                        for position, vector_id in enumerate(document["chunk_ids"])
+                    ],
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints (vector_id, signature) VALUES (?, ?)",
+                [(vector_id, bytes.fromhex(signature)) for vector_id, signature, _ in fingerprints],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO fingerprint_bands (bucket, vector_id) VALUES (?, ?)",
+                [
+                    (bucket, vector_id)
+                    for vector_id, _, bucket_list in fingerprints
+                    for bucket in bucket_list
+                ],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO text_digests (vector_id, digest) VALUES (?, ?)",
+                [(vector_id, digest) for vector_id, digest in digests],
+            )
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "doc_id": row["doc_id"],
+            "source": row["source"],
+            "size_bytes": row["size_bytes"],
+            "page_count": row["page_count"],
+            "chunk_count": row["chunk_count"],
+            "indexed_at": row["indexed_at"],
+        }
@@ -1,5 +1,5 @@
 import hashlib
-from typing import Dict, List
+from typing import Any, Dict, List
 
 import fitz  # PyMuPDF
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -13,9 +13,10 @@ class DocumentProcessor:
             keep_separator=True
         )
     
-    def process_document(self, content: bytes, filename: str) -> List[Dict[str, str]]:
+    def process_document(self, content: bytes, filename: str) -> List[Dict[str, Any]]:
         """Processa documento e retorna chunks"""
         text = ""
+        page_count = None
 
         doc_id = hashlib.sha256(content).hexdigest()
         
@@ -24,6 +25,7 @@ class DocumentProcessor:
         if normalized_filename.endswith('.pdf'):
             # Extrair texto do PDF
             pdf_document = fitz.open(stream=content, filetype="pdf")
+            page_count = pdf_document.page_count
             for page in pdf_document:
                 text += page.get_text()
             pdf_document.close()
@@ -35,6 +37,12 @@ class DocumentProcessor:
         chunks = self.text_splitter.split_text(text)
         
         return [
-            {"text": chunk, "source": filename, "doc_id": doc_id}
+            {
+                "text": chunk,
+                "source": filename,
+                "doc_id": doc_id,
+                "size_bytes": len(content),
+                "page_count": page_count,
+            }
             for chunk in chunks
         ]
@@ -0,0 +1,145 @@
+"""Agendamento de embeddings por comprimento de tokens.
+
+Modelos transformer preenchem (padding) cada lote ate o maior texto dele,
+entao misturar chunks curtos e longos desperdica computacao. O
+``LengthBucketedEmbeddings`` envolve um objeto de embeddings (interface
+``embed_documents``/``embed_query``) e:
+
+* mede cada texto em tokens (tokenizer do modelo, truncado em
+  ``max_seq_length``; sem tokenizer, conta palavras);
+* ordena por comprimento e forma lotes por orcamento de tokens
+  (``itens no lote x maior comprimento <= token_budget``), ou seja, lotes
+  grandes de textos curtos e lotes pequenos de textos longos;
+* devolve os vetores na ordem original;
+* opcionalmente distribui os lotes entre processos, cada um com numero
+  fixo de threads do torch para nao disputarem os mesmos nucleos.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Embeddings do processo auxiliar, criadas uma unica vez pelo initializer
+_WORKER_EMBEDDINGS: Any = None
+
+
+def _init_worker(factory: Callable[[], Any], threads: int) -> None:
+    global _WORKER_EMBEDDINGS
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:  # pragma: no cover - embeddings sem torch
+        pass
+    _WORKER_EMBEDDINGS = factory()
+
+
+def _embed_in_worker(texts: List[str]) -> List[List[float]]:
+    return _WORKER_EMBEDDINGS.embed_documents(texts)
+
+
+def plan_batches(lengths: Sequence[int], token_budget: int, max_batch_size: int) -> List[List[int]]:
+    """Agrupa indices de ``lengths`` em lotes ordenados por comprimento.
+
+    O custo de um lote com padding e ``len(lote) * max(comprimentos)``; cada
+    lote respeita ``token_budget`` (um texto sozinho sempre forma um lote)
+    e ``max_batch_size`` itens.
+    """
+    order = sorted(range(len(lengths)), key=lambda index: lengths[index])
+    batches: List[List[int]] = []
+    batch: List[int] = []
+    for index in order:
+        # Em ordem crescente, o texto atual e o mais longo do lote
+        padded = (len(batch) + 1) * max(lengths[index], 1)
+        if batch and (padded > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class LengthBucketedEmbeddings:
+    """Envolve embeddings existentes com lotes por comprimento de tokens."""
+
+    def __init__(
+        self,
+        base: Any,
+        token_budget: int = 1024,
+        max_batch_size: int = 128,
+        workers: int = 0,
+        threads_per_worker: int = 1,
+        worker_factory: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        if workers > 0 and worker_factory is None:
+            raise ValueError("worker_factory e obrigatorio quando workers > 0")
+        self.base = base
+        self.token_budget = max(token_budget, 1)
+        self.max_batch_size = max(max_batch_size, 1)
+        self.workers = max(workers, 0)
+        self.threads_per_worker = max(threads_per_worker, 1)
+        self.worker_factory = worker_factory
+        self.logger = logging.getLogger(__name__)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def token_lengths(self, texts: Sequence[str]) -> List[int]:
+        client = getattr(self.base, "client", None)
+        tokenizer = getattr(client, "tokenizer", None)
+        if tokenizer is None:
+            return [len(_WORD_PATTERN.findall(text)) + 2 for text in texts]
+        max_length = getattr(client, "max_seq_length", None)
+        encoded = tokenizer(
+            list(texts),
+            add_special_tokens=True,
+            truncation=max_length is not None,
+            max_length=max_length,
+        )["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        batches = plan_batches(self.token_lengths(texts), self.token_budget, self.max_batch_size)
+        payloads = [[texts[index] for index in batch] for batch in batches]
+
+        if self.workers and len(batches) > 1:
+            # Lotes mais longos primeiro, para equilibrar a carga entre processos
+            results = list(self._executor().map(_embed_in_worker, payloads[::-1]))[::-1]
+        else:
+            results = [self.base.embed_documents(payload) for payload in payloads]
+
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        for batch, vectors in zip(batches, results):
+            for index, vector in zip(batch, vectors):
+                embeddings[index] = vector
+        return embeddings  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.base.embed_query(text)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self.logger.info(
+                "Iniciando %d processos de embedding com %d thread(s) cada.",
+                self.workers,
+                self.threads_per_worker,
+            )
+            # "spawn": o torch do processo pai pode ter threads ativas, e fork as herdaria travadas
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.worker_factory, self.threads_per_worker),
+            )
+        return self._pool
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,384 @@
+"""Snapshots compactos do indice vetorial (exportacao/importacao).
+
+Formato do arquivo (little-endian)::
+
+    MAGIC | vetores (n x dim, float16/float32) | registros JSON | offsets (uint64, n + 1)
+          | catalogo JSON | cabecalho JSON | tamanho do cabecalho (uint64) | MAGIC
+
+Os vetores ficam contiguos e alinhados, podendo ser mapeados em memoria sem
+copia; cada registro (``id``, ``text``, ``metadata``) e lido sob demanda a
+partir dos offsets. O cabecalho descreve as secoes e seus SHA-256, e o
+``checksum`` do snapshot identifica a versao para encadear snapshots
+incrementais (``kind="delta"``), que guardam apenas vetores adicionados ou
+alterados (texto/metadados) e ids removidos em relacao ao snapshot pai. O
+campo ``revision`` do cabecalho registra a revisao do catalogo exportada,
+usada como ponto de partida do proximo delta.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+SNAPSHOT_MAGIC = b"RAGSNAP1"
+SNAPSHOT_FORMAT = "rag-index-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".ragsnap"
+SUPPORTED_DTYPES = ("float16", "float32")
+
+_ALIGNMENT = 64
+_FOOTER = struct.Struct("<Q8s")
+_COPY_BUFFER = 1 << 20
+
+# (id, embedding, texto, metadados)
+SnapshotRecord = Tuple[str, Sequence[float], str, Dict[str, Any]]
+
+
+class SnapshotError(ValueError):
+    """Snapshot invalido, corrompido ou fora de ordem na cadeia de deltas."""
+
+
+class _SectionWriter:
+    def __init__(self, handle) -> None:
+        self.handle = handle
+        self.sections: Dict[str, Dict[str, Any]] = {}
+        self._current: Optional[str] = None
+        self._digest = hashlib.sha256()
+        self._start = 0
+
+    def align(self, boundary: int = _ALIGNMENT) -> None:
+        position = self.handle.tell()
+        padding = (-position) % boundary
+        if padding:
+            self.handle.write(b"\0" * padding)
+
+    def start(self, name: str) -> None:
+        self.align()
+        self._current = name
+        self._digest = hashlib.sha256()
+        self._start = self.handle.tell()
+
+    def write(self, data: bytes) -> None:
+        self._digest.update(data)
+        self.handle.write(data)
+
+    def finish(self) -> None:
+        assert self._current is not None
+        self.sections[self._current] = {
+            "offset": self._start,
+            "length": self.handle.tell() - self._start,
+            "sha256": self._digest.hexdigest(),
+        }
+        self._current = None
+
+
+def _snapshot_checksum(header: Dict[str, Any]) -> str:
+    payload = {key: value for key, value in header.items() if key not in {"checksum", "sections"}}
+    digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8"))
+    for name in sorted(header["sections"]):
+        digest.update(name.encode("utf-8"))
+        digest.update(header["sections"][name]["sha256"].encode("ascii"))
+    return digest.hexdigest()
+
+
+def write_snapshot(
+    path: str,
+    records: Iterable[SnapshotRecord],
+    dtype: str = "float16",
+    kind: str = "full",
+    parent: Optional[str] = None,
+    deleted_ids: Sequence[str] = (),
+    catalog: Optional[Dict[str, Any]] = None,
+    revision: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Grava um snapshot de forma atomica e retorna seu cabecalho.
+
+    ``records`` e consumido em streaming: os vetores vao direto para o
+    arquivo final e os textos/metadados para um arquivo temporario, de modo
+    que a memoria usada nao depende do tamanho do indice.
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise SnapshotError(f"dtype nao suportado: {dtype}")
+    if kind not in {"full", "delta"}:
+        raise SnapshotError(f"tipo de snapshot invalido: {kind}")
+    if kind == "delta" and not parent:
+        raise SnapshotError("snapshots delta precisam do checksum do snapshot pai")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle, tempfile.TemporaryFile(dir=directory) as blob:
+            handle.write(SNAPSHOT_MAGIC)
+            writer = _SectionWriter(handle)
+
+            offsets: List[int] = [0]
+            dim = 0
+            writer.start("vectors")
+            for vector_id, embedding, text, metadata in records:
+                vector = np.asarray(embedding, dtype=np.float32)
+                if dim == 0:
+                    dim = int(vector.shape[0])
+                elif vector.shape != (dim,):
+                    raise SnapshotError(f"dimensao inconsistente para o vetor {vector_id}")
+                writer.write(vector.astype(dtype).tobytes())
+                record = json.dumps(
+                    {"id": vector_id, "text": text, "metadata": metadata}, ensure_ascii=False
+                ).encode("utf-8")
+                blob.write(record)
+                offsets.append(offsets[-1] + len(record))
+            writer.finish()
+
+            writer.start("records")
+            blob.seek(0)
+            for data in iter(lambda: blob.read(_COPY_BUFFER), b""):
+                writer.write(data)
+            writer.finish()
+
+            writer.start("offsets")
+            writer.write(np.asarray(offsets, dtype="<u8").tobytes())
+            writer.finish()
+
+            writer.start("catalog")
+            writer.write(json.dumps(catalog or {}, ensure_ascii=False).encode("utf-8"))
+            writer.finish()
+
+            header: Dict[str, Any] = {
+                "format": SNAPSHOT_FORMAT,
+                "version": SNAPSHOT_VERSION,
+                "kind": kind,
+                "parent": parent,
+                "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "dtype": dtype,
+                "dim": dim,
+                "count": len(offsets) - 1,
+                "deleted_ids": list(deleted_ids),
+                "revision": revision,
+                "sections": writer.sections,
+            }
+            header["checksum"] = _snapshot_checksum(header)
+
+            encoded = json.dumps(header).encode("utf-8")
+            handle.write(encoded)
+            handle.write(_FOOTER.pack(len(encoded), SNAPSHOT_MAGIC))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return header
+
+
+class IndexSnapshot:
+    """Snapshot aberto via ``mmap``: vetores e registros sao lidos sem copia."""
+
+    def __init__(self, path: str, verify: bool = True) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:  # arquivo vazio
+            self._file.close()
+            raise SnapshotError(f"snapshot vazio: {path}") from exc
+
+        try:
+            self.header = self._read_header()
+            if verify:
+                self.verify()
+        except BaseException:
+            self.close()
+            raise
+
+        dtype = np.dtype(self.header["dtype"]).newbyteorder("<")
+        vectors = self.header["sections"]["vectors"]
+        self.vectors = np.frombuffer(
+            self._mm, dtype=dtype, count=self.count * self.dim, offset=vectors["offset"]
+        ).reshape(self.count, self.dim)
+        offsets = self.header["sections"]["offsets"]
+        self._offsets = np.frombuffer(
+            self._mm, dtype="<u8", count=self.count + 1, offset=offsets["offset"]
+        )
+        self._records_offset = self.header["sections"]["records"]["offset"]
+
+    def _read_header(self) -> Dict[str, Any]:
+        size = len(self._mm)
+        if size < len(SNAPSHOT_MAGIC) + _FOOTER.size or self._mm[:8] != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"arquivo nao e um snapshot: {self.path}")
+        header_length, magic = _FOOTER.unpack(self._mm[size - _FOOTER.size :])
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"snapshot truncado: {self.path}")
+        start = size - _FOOTER.size - header_length
+        header = json.loads(self._mm[start : size - _FOOTER.size].decode("utf-8"))
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != SNAPSHOT_VERSION:
+            raise SnapshotError(f"versao de snapshot nao suportada: {header.get('version')}")
+        if _snapshot_checksum(header) != header.get("checksum"):
+            raise SnapshotError(f"cabecalho corrompido: {self.path}")
+        return header
+
+    def verify(self) -> None:
+        """Confere o SHA-256 de cada secao."""
+        for name, section in self.header["sections"].items():
+            digest = hashlib.sha256()
+            end = section["offset"] + section["length"]
+            for start in range(section["offset"], end, _COPY_BUFFER):
+                digest.update(self._mm[start : min(start + _COPY_BUFFER, end)])
+            if digest.hexdigest() != section["sha256"]:
+                raise SnapshotError(f"secao '{name}' corrompida em {self.path}")
+
+    @property
+    def checksum(self) -> str:
+        return self.header["checksum"]
+
+    @property
+    def kind(self) -> str:
+        return self.header["kind"]
+
+    @property
+    def parent(self) -> Optional[str]:
+        return self.header["parent"]
+
+    @property
+    def count(self) -> int:
+        return self.header["count"]
+
+    @property
+    def dim(self) -> int:
+        return self.header["dim"]
+
+    @property
+    def deleted_ids(self) -> List[str]:
+        return self.header["deleted_ids"]
+
+    @property
+    def revision(self) -> Optional[Dict[str, Any]]:
+        """``{"instance", "revision"}`` do catalogo exportado (ausente em snapshots antigos)."""
+        return self.header.get("revision")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, index: int) -> Dict[str, Any]:
+        start = self._records_offset + int(self._offsets[index])
+        end = self._records_offset + int(self._offsets[index + 1])
+        return json.loads(self._mm[start:end].decode("utf-8"))
+
+    def iter_batches(
+        self, batch_size: int = 1000
+    ) -> Iterator[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """Itera ``(registros, vetores float32)`` em lotes."""
+        for start in range(0, self.count, batch_size):
+            end = min(start + batch_size, self.count)
+            records = [self.record(index) for index in range(start, end)]
+            yield records, np.asarray(self.vectors[start:end], dtype=np.float32)
+
+    def ids(self) -> Iterator[str]:
+        for index in range(self.count):
+            yield self.record(index)["id"]
+
+    def catalog(self) -> Dict[str, Any]:
+        section = self.header["sections"]["catalog"]
+        start = section["offset"]
+        return json.loads(self._mm[start : start + section["length"]].decode("utf-8"))
+
+    def close(self) -> None:
+        # Views numpy mantem o mmap vivo; liberamos as referencias antes.
+        self.vectors = None  # type: ignore[assignment]
+        self._offsets = None  # type: ignore[assignment]
+        try:
+            self._mm.close()
+        except BufferError:  # ainda existem views externas; o GC libera depois
+            pass
+        self._file.close()
+
+    def __enter__(self) -> "IndexSnapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def open_chain(paths: Sequence[str], verify: bool = True) -> List[IndexSnapshot]:
+    """Abre um snapshot completo seguido de seus deltas, validando o encadeamento."""
+    snapshots: List[IndexSnapshot] = []
+    try:
+        for path in paths:
+            snapshot = IndexSnapshot(path, verify=verify)
+            snapshots.append(snapshot)
+            if len(snapshots) == 1:
+                if snapshot.kind != "full":
+                    raise SnapshotError("a cadeia deve comecar por um snapshot completo")
+            elif snapshot.parent != snapshots[-2].checksum:
+                raise SnapshotError(f"{path} nao e delta do snapshot anterior")
+    except BaseException:
+        for snapshot in snapshots:
+            snapshot.close()
+        raise
+    return snapshots
+
+
+def chain_state(snapshots: Sequence[IndexSnapshot]) -> Tuple[Set[str], Dict[str, Optional[str]]]:
+    """Reconstroi os ids vivos e os documentos (doc_id -> indexed_at) de uma cadeia."""
+    ids: Set[str] = set()
+    documents: Dict[str, Optional[str]] = {}
+    for snapshot in snapshots:
+        ids.difference_update(snapshot.deleted_ids)
+        ids.update(snapshot.ids())
+        catalog = snapshot.catalog()
+        for doc_id in catalog.get("deleted_documents", []):
+            documents.pop(doc_id, None)
+        for document in catalog.get("documents", []):
+            documents[document["doc_id"]] = document.get("indexed_at")
+    return ids, documents
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Exporta/importa snapshots do indice RAG.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="gera um snapshot do indice atual")
+    export_parser.add_argument("path")
+    export_parser.add_argument(
+        "--base", nargs="+", default=(), help="cadeia (completo + deltas) usada como base do delta"
+    )
+    export_parser.add_argument("--dtype", default="float16", choices=SUPPORTED_DTYPES)
+
+    import_parser = subparsers.add_parser("import", help="carrega snapshot completo + deltas")
+    import_parser.add_argument("paths", nargs="+")
+
+    verify_parser = subparsers.add_parser("verify", help="valida checksums de snapshots")
+    verify_parser.add_argument("paths", nargs="+")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "verify":
+        for snapshot in open_chain(args.paths):
+            print(f"{snapshot.path}: {snapshot.kind} {snapshot.count} vetores {snapshot.checksum}")
+            snapshot.close()
+        return
+
+    try:
+        from backend.core.rag_engine import RAGEngine
+    except ModuleNotFoundError:  # pragma: no cover - execucao a partir de backend/
+        from core.rag_engine import RAGEngine  # type: ignore
+
+    engine = RAGEngine()
+    if args.command == "export":
+        header = engine.export_snapshot(args.path, dtype=args.dtype, base_paths=args.base)
+        print(f"{args.path}: {header['kind']} {header['count']} vetores {header['checksum']}")
+    else:
+        engine.import_snapshot(args.paths)
+        print(f"{len(args.paths)} snapshot(s) importado(s)")
+
+
+if __name__ == "__main__":
+    main()
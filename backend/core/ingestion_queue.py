@@ -0,0 +1,180 @@
+"""Fila de escrita com group commit para o vector store.
+
+Todas as escritas (indexacao e remocao de documentos) passam por uma unica
+thread escritora. Operacoes que chegam juntas sao agrupadas em um lote e
+aplicadas de uma vez: uma chamada ao modelo de embeddings, um delete, um
+``upsert`` e um ``persist`` por lote, em vez de um por upload. O lote
+fecha ao atingir ``max_batch_chunks`` chunks ou, havendo outras operacoes
+na fila, apos ``max_delay`` segundos desde a primeira; uma operacao
+isolada e aplicada imediatamente.
+
+Se o lote falhar, ``rollback`` desfaz o que foi aplicado pela metade e as
+operacoes sao reaplicadas uma a uma: apenas a operacao defeituosa devolve
+erro ao chamador.
+
+O chamador so recebe a confirmacao depois que o lote foi aplicado, e os
+estados ``pending``/``pending_purges`` do catalogo permitem desfazer um
+lote interrompido na inicializacao; por isso nao ha log proprio de
+operacoes.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# {"op": "index", "chunks": [...]}, {"op": "delete", "doc_id": "..."} ou
+# {"op": "import", "paths": [...], "batch_size": N}
+Operation = Dict[str, Any]
+
+
+class ReadWriteLock:
+    """Lock de leitores/escritor com preferencia para o escritor.
+
+    Consultas seguram o lock de leitura; a aplicacao de um lote segura o
+    de escrita, de modo que nenhuma consulta enxerga um lote pela metade.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = False
+                self._condition.notify_all()
+
+
+class IngestionQueue:
+    """Thread escritora unica que aplica operacoes em lotes (group commit)."""
+
+    def __init__(
+        self,
+        apply_batch: Callable[[List[Operation]], List[Any]],
+        max_batch_chunks: int = 512,
+        max_delay: float = 0.05,
+        rollback: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.apply_batch = apply_batch
+        self.rollback = rollback
+        self.max_batch_chunks = max(max_batch_chunks, 1)
+        self.max_delay = max(max_delay, 0.0)
+        self.logger = logging.getLogger(__name__)
+        self._queue: "queue.Queue[Optional[Tuple[Operation, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="rag-ingestion", daemon=True)
+            self._thread.start()
+
+    def submit(self, operation: Operation) -> Future:
+        future: Future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    @staticmethod
+    def _weight(operation: Operation) -> int:
+        return max(len(operation.get("chunks", ())), 1)
+
+    def _collect(
+        self, first: Tuple[Operation, Future]
+    ) -> Tuple[List[Tuple[Operation, Future]], bool]:
+        """Junta operacoes ate o limite de chunks/tempo; indica pedido de parada."""
+        batch = [first]
+        weight = self._weight(first[0])
+        deadline = time.monotonic() + self.max_delay
+        while weight < self.max_batch_chunks:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                # Operacao isolada (sem concorrencia) e aplicada sem esperar o prazo.
+                timeout = deadline - time.monotonic()
+                if len(batch) == 1 or timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            weight += self._weight(item[0])
+        return batch, False
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, stop = self._collect(first)
+            operations = [operation for operation, _ in batch]
+            try:
+                results = self.apply_batch(operations)
+            except Exception as exc:  # noqa: BLE001 - o erro e repassado ao chamador
+                self.logger.exception("Falha ao aplicar lote de %d operacoes", len(batch))
+                self._rollback()
+                if len(batch) == 1:
+                    batch[0][1].set_exception(exc)
+                else:
+                    self._apply_individually(batch)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def _apply_individually(self, batch: List[Tuple[Operation, Future]]) -> None:
+        """Reaplica um lote que falhou operacao por operacao."""
+        for operation, future in batch:
+            try:
+                result = self.apply_batch([operation])[0]
+            except Exception as exc:  # noqa: BLE001 - o erro e repassado ao chamador
+                self.logger.exception("Falha ao aplicar operacao %s", operation.get("op"))
+                self._rollback()
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def _rollback(self) -> None:
+        if self.rollback is None:
+            return
+        try:
+            self.rollback()
+        except Exception:  # noqa: BLE001 - a proxima inicializacao tenta de novo
+            self.logger.exception("Falha ao desfazer lote interrompido")
@@ -18,6 +18,19 @@ DEFAULT_PROMPT = (
 )
 
 
+def build_context(documents: List[Document], max_chars: int) -> str:
+    """Monta o CONTEXTO do prompt (tambem usado para gerar dados de treino)."""
+    snippets = []
+    for idx, doc in enumerate(documents, start=1):
+        source = doc.metadata.get("source", f"fonte_{idx}")
+        snippet = doc.page_content.strip()
+        snippets.append(f"[Fonte {idx} | {source}]\n{snippet}")
+    context = "\n\n".join(snippets)
+    if len(context) > max_chars:
+        context = context[:max_chars]
+    return context
+
+
 class LLMGenerator:
     """Carrega um modelo local via Transformers para gerar respostas."""
 
@@ -124,12 +137,4 @@ class LLMGenerator:
         return generated.strip() or "Nao consegui gerar uma resposta com o modelo configurado."
 
     def _build_context(self, documents: List[Document]) -> str:
-        snippets = []
-        for idx, doc in enumerate(documents, start=1):
-            source = doc.metadata.get("source", f"fonte_{idx}")
-            snippet = doc.page_content.strip()
-            snippets.append(f"[Fonte {idx} | {source}]\n{snippet}")
-        context = "\n\n".join(snippets)
-        if len(context) > self.max_context_chars:
-            context = context[: self.max_context_chars]
-        return context
+        return build_context(documents, self.max_context_chars)
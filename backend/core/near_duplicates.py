@@ -0,0 +1,100 @@
+"""Deteccao de chunks quase duplicados (MinHash + LSH por bandas)."""
+from __future__ import annotations
+
+import hashlib
+import re
+import struct
+from typing import List, Sequence, Set, Tuple
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+Signature = Tuple[int, ...]
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def text_digest(text: str) -> str:
+    """Digest do texto normalizado (minusculas, apenas palavras).
+
+    Dois chunks com o mesmo digest tem exatamente as mesmas palavras e podem
+    compartilhar um unico vetor.
+    """
+    normalized = " ".join(_WORD_PATTERN.findall(text.lower()))
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class MinHasher:
+    """Calcula assinaturas MinHash de textos curtos (chunks).
+
+    Os textos sao normalizados (minusculas, apenas palavras) e quebrados em
+    shingles de ``shingle_size`` palavras. A assinatura e dividida em
+    ``bands`` faixas para LSH: dois chunks viram candidatos quando
+    compartilham ao menos uma faixa, e a similaridade de Jaccard estimada
+    decide se sao de fato duplicados.
+    """
+
+    def __init__(
+        self, num_perm: int = 64, bands: int = 16, shingle_size: int = 3, seed: int = 1
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser multiplo de bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._permutations = self._build_permutations(num_perm, seed)
+        self._struct = struct.Struct(f"<{num_perm}I")
+
+    @staticmethod
+    def _build_permutations(num_perm: int, seed: int) -> List[Tuple[int, int]]:
+        permutations = []
+        for idx in range(num_perm):
+            digest = hashlib.sha256(f"{seed}:{idx}".encode("utf-8")).digest()
+            a = int.from_bytes(digest[:8], "big") % (_MERSENNE_PRIME - 1) + 1
+            b = int.from_bytes(digest[8:16], "big") % _MERSENNE_PRIME
+            permutations.append((a, b))
+        return permutations
+
+    def shingles(self, text: str) -> Set[int]:
+        words = _WORD_PATTERN.findall(text.lower())
+        if not words:
+            return set()
+        size = min(self.shingle_size, len(words))
+        return {
+            _hash64(" ".join(words[i : i + size])) for i in range(len(words) - size + 1)
+        }
+
+    def signature(self, text: str) -> Signature:
+        shingles = self.shingles(text)
+        if not shingles:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * shingle + b) % _MERSENNE_PRIME) & _MAX_HASH for shingle in shingles)
+            for a, b in self._permutations
+        )
+
+    def band_keys(self, signature: Signature) -> List[str]:
+        keys = []
+        for band in range(self.bands):
+            rows = signature[band * self.rows : (band + 1) * self.rows]
+            digest = hashlib.blake2b(repr(rows).encode("ascii"), digest_size=8).hexdigest()
+            keys.append(f"{band}:{digest}")
+        return keys
+
+    @staticmethod
+    def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+        """Estimativa da similaridade de Jaccard entre duas assinaturas."""
+        if not first:
+            return 0.0
+        matches = sum(1 for a, b in zip(first, second) if a == b)
+        return matches / len(first)
+
+    def pack(self, signature: Signature) -> bytes:
+        return self._struct.pack(*signature)
+
+    def unpack(self, data: bytes) -> Signature:
+        return self._struct.unpack(data)
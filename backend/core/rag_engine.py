@@ -1,16 +1,71 @@
+import functools
 import hashlib
 import logging
 import os
 import random
-from typing import Any, Dict, List
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 
 try:  # compatibilidade ao importar via "backend.core" ou diretamente de "core"
+    from backend.core.document_catalog import DocumentCatalog, Fingerprint, TextDigest
+    from backend.core.embedding_scheduler import LengthBucketedEmbeddings
+    from backend.core.ingestion_queue import (
+        IngestionQueue,
+        Operation,
+        ReadWriteLock,
+    )
+    from backend.core.index_snapshot import (
+        SNAPSHOT_SUFFIX,
+        IndexSnapshot,
+        SnapshotRecord,
+        chain_state,
+        open_chain,
+        write_snapshot,
+    )
     from backend.core.llm_generator import LLMGenerator
+    from backend.core.near_duplicates import MinHasher, Signature, text_digest
+    from backend.core.vector_index import IVFIndex
+    from backend.core.shared_index import (
+        GenerationPublisher,
+        ReadOnlyIndexError,
+        SharedIndex,
+        read_current_generation,
+    )
 except ModuleNotFoundError:  # pragma: no cover - caminho utilizado na execucao direta
+    from core.document_catalog import DocumentCatalog, Fingerprint, TextDigest  # type: ignore
+    from core.embedding_scheduler import LengthBucketedEmbeddings  # type: ignore
+    from core.ingestion_queue import (  # type: ignore
+        IngestionQueue,
+        Operation,
+        ReadWriteLock,
+    )
+    from core.index_snapshot import (  # type: ignore
+        SNAPSHOT_SUFFIX,
+        IndexSnapshot,
+        SnapshotRecord,
+        chain_state,
+        open_chain,
+        write_snapshot,
+    )
     from core.llm_generator import LLMGenerator  # type: ignore
+    from core.near_duplicates import MinHasher, Signature, text_digest  # type: ignore
+    from core.vector_index import IVFIndex  # type: ignore
+    from core.shared_index import (  # type: ignore
+        GenerationPublisher,
+        ReadOnlyIndexError,
+        SharedIndex,
+        read_current_generation,
+    )
+
+
+_LEGACY_BACKFILL_KEY = "legacy_backfill_at"
+_DIGEST_BACKFILL_KEY = "text_digest_backfill_at"
 
 
 class _DeterministicFallbackEmbeddings:
@@ -39,14 +94,92 @@ class RAGEngine:
         # Embeddings em portugues (com fallback deterministico offline)
         self.embeddings = self._load_embeddings()
 
-        # Vector store persistente
-        persist_directory = "./data/chroma_db"
-        os.makedirs(persist_directory, exist_ok=True)
+        # Papel do processo: "standalone" (padrao), "writer" (unico processo que
+        # indexa e publica geracoes) ou "reader" (workers que so consultam)
+        self.role = os.getenv("RAG_ROLE", "standalone").lower()
+        data_directory = os.getenv("RAG_DATA_DIR", "./data")
+        self.snapshot_directory = os.path.join(data_directory, "snapshots")
+        generations_directory = os.path.join(data_directory, "generations")
+        self.generation_dtype = os.getenv("RAG_GENERATION_DTYPE", "float16")
+        # No maximo uma geracao por intervalo; deltas ate a proxima compactacao
+        self.generation_interval = float(os.getenv("RAG_GENERATION_INTERVAL_SECONDS", "1"))
+        self.generation_max_deltas = int(os.getenv("RAG_GENERATION_MAX_DELTAS", "32"))
+        self.generation_compact_min = int(os.getenv("RAG_GENERATION_COMPACT_MIN", "10000"))
+        self.generation_compact_ratio = float(os.getenv("RAG_GENERATION_COMPACT_RATIO", "0.1"))
+        # Geracoes completas a partir deste tamanho ganham indice IVF (busca aproximada)
+        self.ann_min_vectors = int(os.getenv("RAG_INDEX_ANN_MIN", "20000"))
+        self.ann_nlist = int(os.getenv("RAG_INDEX_NLIST", "0"))
+        self.publisher: Optional[GenerationPublisher] = None
+        self._generation_dirty = threading.Event()
+        self._generation_stop = threading.Event()
+        self._generation_lock = threading.Lock()
+        self._generation_thread: Optional[threading.Thread] = None
+        self.ingestion: Optional[IngestionQueue] = None
+        # Consultas leem sob lock compartilhado; cada lote de escrita e atomico para elas
+        self._index_lock = ReadWriteLock()
 
-        self.vectorstore = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=self.embeddings,
-        )
+        # Catalogo de documentos (doc_id -> ids dos vetores) mantido ao lado do Chroma
+        self.catalog = DocumentCatalog(os.path.join(data_directory, "catalog.sqlite3"))
+
+        if self.read_only:
+            # Workers de consulta nunca abrem o Chroma: servem a geracao publicada
+            self.vectorstore = SharedIndex(
+                generations_directory,
+                self.embeddings,
+                refresh_interval=float(os.getenv("RAG_INDEX_REFRESH_SECONDS", "2")),
+                nprobe=int(os.getenv("RAG_INDEX_NPROBE", "8")),
+            )
+        else:
+            # Vector store persistente
+            persist_directory = os.path.join(data_directory, "chroma_db")
+            os.makedirs(persist_directory, exist_ok=True)
+
+            self.vectorstore = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings,
+            )
+            self._recover_catalog()
+            self._migrate_legacy_vectors()
+            if self.role == "writer":
+                self.publisher = GenerationPublisher(
+                    generations_directory, keep=int(os.getenv("RAG_GENERATIONS_KEEP", "3"))
+                )
+
+        # Deteccao de chunks repetidos ou quase duplicados durante a ingestao
+        self.near_dedup_enabled = os.getenv("RAG_NEAR_DEDUP", "1").lower() in {"1", "true", "yes"}
+        self.near_dedup_threshold = float(os.getenv("RAG_NEAR_DEDUP_THRESHOLD", "0.9"))
+        self.minhasher = MinHasher()
+
+        if not self.read_only:
+            # Escritor unico com group commit; lotes interrompidos sao desfeitos pelo catalogo
+            self.ingestion = IngestionQueue(
+                self._apply_batch,
+                max_batch_chunks=int(os.getenv("RAG_INGEST_MAX_BATCH_CHUNKS", "512")),
+                max_delay=float(os.getenv("RAG_INGEST_MAX_DELAY_MS", "50")) / 1000,
+                rollback=self._rollback_batch,
+            )
+            self.ingestion.start()
+
+        # Bootstrap rapido de novos nos a partir de snapshot (completo + deltas)
+        bootstrap = [path for path in os.getenv("RAG_BOOTSTRAP_SNAPSHOTS", "").split(",") if path]
+        if (
+            bootstrap
+            and not self.read_only
+            and self.vectorstore._collection.count() == 0  # type: ignore[attr-defined]
+        ):
+            self.logger.info("Carregando indice a partir de %d snapshot(s).", len(bootstrap))
+            self.import_snapshot(bootstrap)
+
+        if self.publisher is not None:
+            if read_current_generation(generations_directory) is None:
+                self._publish_generation()
+            else:
+                # A geracao em disco pode ser anterior a escritas da execucao passada
+                self._schedule_generation()
+            self._generation_thread = threading.Thread(
+                target=self._publication_loop, name="rag-generations", daemon=True
+            )
+            self._generation_thread.start()
 
         # Gerador LLM para respostas finais
         self.llm = LLMGenerator()
@@ -55,51 +188,931 @@ class RAGEngine:
                 "LLM nao inicializado. Motivo: %s", self.llm.load_error or "modelo nao configurado"
             )
 
-    def index_documents(self, chunks: List[Dict[str, str]]) -> None:
-        """Indexa chunks de documentos no vectorstore."""
-        if not chunks:
-            self.logger.warning("Nenhum chunk recebido para indexacao.")
-            return
+    @property
+    def read_only(self) -> bool:
+        return self.role == "reader"
+
+    def _ensure_writable(self) -> None:
+        if self.read_only:
+            raise ReadOnlyIndexError(
+                "Este no apenas serve consultas (RAG_ROLE=reader); envie escritas ao writer."
+            )
+
+    def close(self) -> None:
+        """Drena a fila de escrita, publica a ultima geracao e encerra os workers."""
+        if self.ingestion is not None:
+            self.ingestion.close()
+        if self._generation_thread is not None:
+            self._generation_stop.set()
+            self._generation_dirty.set()
+            self._generation_thread.join()
+            self._generation_thread = None
+        self.flush_generation()
+        # Pool de processos de embedding (RAG_EMBED_WORKERS); o fallback nao tem close()
+        if hasattr(self.embeddings, "close"):
+            self.embeddings.close()
 
-        doc_id = chunks[0].get("doc_id")
-        if doc_id:
+    def _schedule_generation(self) -> None:
+        """Marca o indice como alterado; a thread de publicacao agrupa as escritas."""
+        if self.publisher is not None:
+            self._generation_dirty.set()
+
+    def flush_generation(self) -> None:
+        """Publica imediatamente as escritas ainda nao publicadas (somente no writer)."""
+        if self._generation_dirty.is_set():
+            self._publish_generation()
+
+    def _publication_loop(self) -> None:
+        published_at = time.monotonic()
+        while True:
+            self._generation_dirty.wait()
+            if self._generation_stop.is_set():
+                return
+            delay = published_at + self.generation_interval - time.monotonic()
+            if delay > 0 and self._generation_stop.wait(delay):
+                return
+            self._publish_generation()
+            published_at = time.monotonic()
+
+    def _publish_generation(self) -> None:
+        """Publica o estado atual para os workers de leitura (somente no writer).
+
+        Entre compactacoes publica apenas um delta com as mudancas desde a
+        geracao anterior; a cadeia volta a ser um snapshot completo quando
+        os deltas passam de ``generation_max_deltas`` ou acumulam vetores
+        demais em relacao a base.
+        """
+        if self.publisher is None:
+            return
+        with self._generation_lock:
+            self._generation_dirty.clear()
             try:
-                # O wrapper de conveniencia do LangChain nao aceita filtros "where",
-                # entao utilizamos diretamente a collection subjacente do Chroma.
-                self.vectorstore._collection.delete(where={"doc_id": doc_id})  # type: ignore[attr-defined]
-            except Exception:  # noqa: BLE001 - queremos registrar o erro mas seguir adiante
-                self.logger.exception(
-                    "Falha ao remover vetores existentes para doc_id %s", doc_id
+                plan = self._generation_plan(self.publisher.chain_paths())
+                if plan == "delta":
+                    # A cadeia foi gravada por este processo: sem rehash da base a cada delta
+                    name = self.publisher.publish_delta(
+                        lambda path, base_paths: self.export_snapshot(
+                            path,
+                            dtype=self.generation_dtype,
+                            base_paths=base_paths,
+                            verify=False,
+                        )
+                    )
+                elif plan == "full":
+                    name = self.publisher.publish(self._export_generation)
+                else:
+                    return
+                self.logger.info("Geracao %s publicada.", name)
+            except Exception:  # noqa: BLE001 - escrita ja aplicada; leitores seguem na anterior
+                self.logger.exception("Falha ao publicar nova geracao do indice")
+
+    def _export_generation(self, path: str) -> Dict[str, Any]:
+        """Exporta uma geracao completa e, se grande, o indice IVF dos leitores."""
+        header = self.export_snapshot(path, dtype=self.generation_dtype)
+        if header["count"] >= self.ann_min_vectors:
+            with IndexSnapshot(path, verify=False) as snapshot:
+                IVFIndex.build(snapshot.vectors, nlist=self.ann_nlist or None).save(path)
+        return header
+
+    def _generation_plan(self, chain: List[str]) -> str:
+        """``"full"``, ``"delta"`` ou ``"current"`` (nada mudou desde a cadeia publicada)."""
+        if not chain:
+            return "full"
+        headers = []
+        for path in chain:
+            with IndexSnapshot(path, verify=False) as snapshot:
+                headers.append(snapshot.header)
+        instance, revision = self.catalog.revision()
+        published = headers[-1].get("revision") or {}
+        if published.get("instance") != instance:
+            return "full"
+        if published.get("revision") == revision:
+            return "current"
+        deltas = headers[1:]
+        pending = sum(header["count"] + len(header["deleted_ids"]) for header in deltas)
+        limit = max(
+            self.generation_compact_min, self.generation_compact_ratio * headers[0]["count"]
+        )
+        if len(deltas) >= self.generation_max_deltas or pending >= limit:
+            return "full"
+        return "delta"
+
+    def index_documents(self, chunks: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Indexa chunks de documentos no vectorstore.
+
+        Chunks com texto normalizado identico a outros ja indexados
+        (cabecalhos, rodapes, avisos legais) apontam para o vetor existente.
+        Quase duplicados guardam o proprio texto, mas reaproveitam o
+        embedding do trecho parecido. Retorna um resumo da economia obtida.
+
+        A escrita e enfileirada e aplicada em lote junto com uploads
+        concorrentes; a chamada retorna quando o lote foi persistido.
+        """
+        self._ensure_writable()
+        return self._submit({"op": "index", "chunks": chunks})
+
+    def delete_document(self, doc_id: str) -> bool:
+        """Remove um documento do vectorstore e do catalogo.
+
+        Vetores compartilhados com outros documentos (boilerplate) sao
+        mantidos. Retorna ``False`` quando o documento nao esta catalogado.
+        """
+        self._ensure_writable()
+        return self._submit({"op": "delete", "doc_id": doc_id})
+
+    def _submit(self, operation: Operation) -> Any:
+        assert self.ingestion is not None
+        return self.ingestion.submit(operation).result()
+
+    @staticmethod
+    def _operation_doc_id(operation: Operation) -> Optional[str]:
+        if operation["op"] == "delete":
+            return operation["doc_id"]
+        chunks = operation["chunks"]
+        return chunks[0].get("doc_id") if chunks else None
+
+    @staticmethod
+    def _empty_report(chunk_count: int) -> Dict[str, int]:
+        return {
+            "chunks_total": chunk_count,
+            "chunks_embedded": 0,
+            "near_duplicates": 0,
+            "chars_saved": 0,
+        }
+
+    def _apply_batch(self, operations: List[Operation]) -> List[Any]:
+        """Aplica um lote de operacoes, na ordem em que foram enfileiradas.
+
+        Importacoes de snapshot substituem o indice inteiro e sao aplicadas
+        sozinhas; as operacoes entre elas viram uma unica transacao.
+        """
+        results: List[Any] = []
+        writes: List[Operation] = []
+        for operation in operations:
+            if operation["op"] != "import":
+                writes.append(operation)
+                continue
+            if writes:
+                results.extend(self._apply_writes(writes))
+                writes = []
+            self._import_snapshot(operation["paths"], operation["batch_size"])
+            results.append(None)
+        if writes:
+            results.extend(self._apply_writes(writes))
+        self._schedule_generation()
+        return results
+
+    def _apply_writes(self, operations: List[Operation]) -> List[Any]:
+        """Aplica indexacoes e remocoes em uma unica transacao no vector store.
+
+        Para cada doc_id apenas a ultima operacao do lote e aplicada; as
+        anteriores recebem o resultado equivalente. Todas as remocoes viram
+        um unico ``delete`` e todos os chunks novos um unico ``upsert``.
+        """
+        last_position: Dict[str, int] = {}
+        for position, operation in enumerate(operations):
+            doc_id = self._operation_doc_id(operation)
+            if doc_id:
+                last_position[doc_id] = position
+
+        existed, reports = self._apply_operations(operations, last_position)
+
+        results: List[Any] = []
+        indexed_in_batch = set()
+        for position, operation in enumerate(operations):
+            doc_id = self._operation_doc_id(operation)
+            if operation["op"] == "delete":
+                results.append(doc_id in existed or doc_id in indexed_in_batch)
+                indexed_in_batch.discard(doc_id)
+                continue
+            if doc_id:
+                indexed_in_batch.add(doc_id)
+            final_position = last_position.get(doc_id, position) if doc_id else position
+            results.append(
+                reports.get(final_position) or self._empty_report(len(operation["chunks"]))
+            )
+        return results
+
+    def _apply_operations(
+        self, operations: List[Operation], last_position: Dict[str, int]
+    ) -> Tuple[set, Dict[int, Dict[str, int]]]:
+        effective = [
+            (position, operation)
+            for position, operation in enumerate(operations)
+            if last_position.get(self._operation_doc_id(operation) or "", position) == position
+        ]
+
+        # 1. Versoes anteriores (reuploads) e remocoes: por enquanto apenas o plano.
+        #    O catalogo so muda no passo 4, depois dos embeddings; ate la consultas,
+        #    listagens e snapshots seguem vendo a versao anterior
+        existed: List[str] = []
+        for _, operation in effective:
+            doc_id = self._operation_doc_id(operation)
+            if doc_id and self.catalog.vector_ids(doc_id):
+                existed.append(doc_id)
+        release = self._release_plan(existed)
+        released = {vector_id for orphans in release[0].values() for vector_id in orphans}
+
+        # 2. Define os vetores novos (com deduplicacao); os vetores liberados nao contam
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        ids: List[str] = []
+        pending: List[Dict[str, Any]] = []
+        reports: Dict[int, Dict[str, int]] = {}
+        borrowed: Dict[int, str] = {}
+        in_batch: Dict[str, List[Tuple[str, Signature]]] = {}
+        in_batch_digests: Dict[str, str] = {}
+        for position, operation in effective:
+            if operation["op"] != "index":
+                continue
+            chunks = operation["chunks"]
+            if not chunks:
+                self.logger.warning("Nenhum chunk recebido para indexacao.")
+                continue
+
+            doc_id = chunks[0].get("doc_id")
+            doc_texts = [chunk["text"] for chunk in chunks]
+            doc_metadatas = [
+                {
+                    "source": chunk["source"],
+                    "chunk_id": idx,
+                    "doc_id": chunk.get("doc_id"),
+                }
+                for idx, chunk in enumerate(chunks)
+            ]
+
+            if not doc_id:
+                self.logger.warning(
+                    "Chunks sem doc_id; nao foi possivel limpar indices anteriores."
                 )
-        else:
-            self.logger.warning("Chunks sem doc_id; nao foi possivel limpar indices anteriores.")
-
-        texts = [chunk["text"] for chunk in chunks]
-        metadatas = [
-            {
-                "source": chunk["source"],
-                "chunk_id": idx,
-                "doc_id": chunk.get("doc_id"),
-            }
-            for idx, chunk in enumerate(chunks)
+                texts.extend(doc_texts)
+                metadatas.extend(doc_metadatas)
+                ids.extend(str(uuid.uuid4()) for _ in doc_texts)
+                reports[position] = self._empty_report(len(chunks))
+                reports[position]["chunks_embedded"] = len(chunks)
+                continue
+
+            # Ids deterministicos permitem remocoes diretas (sem varrer a colecao)
+            vector_ids, new_positions, doc_borrowed, fingerprints, digests = (
+                self._assign_vector_ids(
+                    doc_id, doc_texts, in_batch, in_batch_digests, excluded=released
+                )
+            )
+            pending.append(
+                {
+                    "doc_id": doc_id,
+                    "source": chunks[0]["source"],
+                    "vector_ids": vector_ids,
+                    "size_bytes": chunks[0].get("size_bytes"),
+                    "page_count": chunks[0].get("page_count"),
+                    "fingerprints": fingerprints,
+                    "digests": digests,
+                }
+            )
+            for idx in new_positions:
+                if idx in doc_borrowed:
+                    borrowed[len(texts)] = doc_borrowed[idx]
+                texts.append(doc_texts[idx])
+                metadatas.append(doc_metadatas[idx])
+                ids.append(vector_ids[idx])
+            reports[position] = self._deduplication_report(
+                doc_id, doc_texts, [idx for idx in new_positions if idx not in doc_borrowed]
+            )
+
+        # 3. Embeddings de todos os uploads em uma unica chamada, fora do lock. Se
+        #    falharem, nada foi alterado e a versao anterior continua indexada
+        embeddings = self._embed_records(ids, texts, borrowed)
+
+        # 4. Uma unica transacao; consultas e snapshots nao enxergam o meio dela.
+        #    Versoes anteriores saem do catalogo (vetores liberados em pending_purges),
+        #    os documentos novos entram como pending e as mudancas sao registradas
+        #    antes da escrita, para os snapshots delta
+        pending_ids = [document["doc_id"] for document in pending]
+        with self._index_lock.write():
+            orphans, shared = self._detach_documents(existed, release)
+            for document in pending:
+                self.catalog.begin(**document)
+            self.catalog.record_changes(orphans + list(shared) + ids, existed + pending_ids)
+            self._delete_vectors(orphans)
+            self._reassign_vectors(shared)
+            if texts:
+                self.vectorstore._collection.upsert(  # type: ignore[attr-defined]
+                    ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas
+                )
+            if texts or orphans:
+                self.vectorstore.persist()
+
+            # 5. Confirma o lote no catalogo
+            self.catalog.clear_purges(orphans)
+            self.catalog.commit_many(pending_ids)
+        return set(existed), reports
+
+    def _embed_records(
+        self, ids: List[str], texts: List[str], borrowed: Dict[int, str]
+    ) -> List[List[float]]:
+        """Embeda ``texts``; as posicoes de ``borrowed`` copiam o embedding da origem.
+
+        A origem pode ser um vetor ja indexado ou outro registro do lote.
+        Quando ela nao existe mais, o texto e embedado normalmente.
+        """
+        if not texts:
+            return []
+        embeddings: List[Any] = [None] * len(texts)
+        to_embed = [idx for idx in range(len(texts)) if idx not in borrowed]
+        computed = self.embeddings.embed_documents([texts[idx] for idx in to_embed])
+        by_id: Dict[str, Any] = {}
+        for idx, vector in zip(to_embed, computed):
+            embeddings[idx] = vector
+            by_id[ids[idx]] = vector
+
+        batch_ids = set(ids)
+        external = sorted({source for source in borrowed.values() if source not in batch_ids})
+        if external:
+            stored = self.vectorstore._collection.get(  # type: ignore[attr-defined]
+                ids=external, include=["embeddings"]
+            )
+            by_id.update(zip(stored["ids"], stored["embeddings"]))
+
+        missing: List[int] = []
+        for idx in sorted(borrowed):
+            vector = by_id.get(borrowed[idx])
+            if vector is None:
+                missing.append(idx)
+                continue
+            embeddings[idx] = vector
+            by_id[ids[idx]] = vector
+        if missing:
+            for idx, vector in zip(
+                missing, self.embeddings.embed_documents([texts[idx] for idx in missing])
+            ):
+                embeddings[idx] = vector
+        return embeddings
+
+    def _deduplication_report(
+        self, doc_id: str, texts: List[str], embedded_positions: List[int]
+    ) -> Dict[str, int]:
+        report = self._empty_report(len(texts))
+        embedded = set(embedded_positions)
+        report["chunks_embedded"] = len(embedded_positions)
+        report["near_duplicates"] = len(texts) - len(embedded_positions)
+        report["chars_saved"] = sum(
+            len(text) for idx, text in enumerate(texts) if idx not in embedded
+        )
+        if report["near_duplicates"]:
+            self.logger.info(
+                "doc_id %s: %d de %d chunks reaproveitados (%d caracteres nao embedados).",
+                doc_id,
+                report["near_duplicates"],
+                report["chunks_total"],
+                report["chars_saved"],
+            )
+        return report
+
+    def _assign_vector_ids(
+        self,
+        doc_id: str,
+        texts: List[str],
+        in_batch: Optional[Dict[str, List[Tuple[str, Signature]]]] = None,
+        in_batch_digests: Optional[Dict[str, str]] = None,
+        excluded: Set[str] = frozenset(),
+    ) -> Tuple[List[str], List[int], Dict[int, str], List[Fingerprint], List[TextDigest]]:
+        """Define o vetor de cada chunk, deduplicando textos repetidos.
+
+        Um chunk so aponta para um vetor existente quando o texto
+        normalizado e identico. Quase duplicados (MinHash; "30 dias" x
+        "15 dias") ganham vetor proprio, com seu texto e metadados, e apenas
+        copiam o embedding do vetor mais parecido.
+
+        Retorna os ids (um por chunk), as posicoes que ganham vetor proprio,
+        as que copiam o embedding (posicao -> vetor de origem) e as
+        assinaturas e digests dos vetores novos. ``in_batch`` e
+        ``in_batch_digests`` acumulam o que ainda nao foi persistido no lote;
+        ``excluded`` sao vetores que o lote vai apagar (versoes anteriores).
+        """
+        own_ids = self._own_vector_ids(doc_id, len(texts), excluded)
+        if not self.near_dedup_enabled:
+            return own_ids, list(range(len(texts))), {}, [], []
+
+        digests = [text_digest(text) for text in texts]
+        signatures = [self.minhasher.signature(text) for text in texts]
+        band_keys = [self.minhasher.band_keys(signature) for signature in signatures]
+        indexed = {
+            key: [entry for entry in entries if entry[0] not in excluded]
+            for key, entries in self.catalog.find_candidates(
+                key for keys in band_keys for key in keys
+            ).items()
+        }
+        identical = {
+            digest: vector_id
+            for digest, vector_id in self.catalog.find_exact(digests).items()
+            if vector_id not in excluded
+        }
+        if in_batch is None:
+            in_batch = {}
+        if in_batch_digests is None:
+            in_batch_digests = {}
+
+        vector_ids: List[str] = []
+        new_positions: List[int] = []
+        borrowed: Dict[int, str] = {}
+        fingerprints: List[Fingerprint] = []
+        new_digests: List[TextDigest] = []
+        for idx, (digest, signature, keys) in enumerate(zip(digests, signatures, band_keys)):
+            same_text = in_batch_digests.get(digest) or identical.get(digest)
+            if same_text is not None:
+                vector_ids.append(same_text)
+                continue
+
+            matches = self._near_matches(signature, keys, indexed, in_batch)
+            vector_id = own_ids[idx]
+            vector_ids.append(vector_id)
+            new_positions.append(idx)
+            if matches:
+                borrowed[idx] = matches[0]
+            fingerprints.append((vector_id, self.minhasher.pack(signature), keys))
+            new_digests.append((vector_id, digest))
+            in_batch_digests[digest] = vector_id
+            for key in keys:
+                in_batch.setdefault(key, []).append((vector_id, signature))
+
+        return vector_ids, new_positions, borrowed, fingerprints, new_digests
+
+    def _own_vector_ids(self, doc_id: str, count: int, excluded: Set[str]) -> List[str]:
+        """Ids dos vetores proprios do documento (``doc_id:posicao``).
+
+        Um id que ainda pertence a um vetor compartilhado com outro documento
+        (texto identico de uma versao anterior) ganha um sufixo, para o
+        upsert nao sobrescrever o texto que o outro documento referencia.
+        """
+        vector_ids = [self._vector_id(doc_id, idx) for idx in range(count)]
+        taken = self.catalog.known_vector_ids(vector_ids) - excluded
+        return [
+            f"{vector_id}:{uuid.uuid4().hex[:8]}" if vector_id in taken else vector_id
+            for vector_id in vector_ids
         ]
 
-        self.vectorstore.add_texts(texts=texts, metadatas=metadatas)
-        self.vectorstore.persist()
+    def _near_matches(
+        self,
+        signature: Signature,
+        keys: Sequence[str],
+        indexed: Dict[str, List[Tuple[str, bytes]]],
+        in_batch: Dict[str, List[Tuple[str, Signature]]],
+    ) -> List[str]:
+        """Vetores acima do limiar de similaridade, do mais parecido ao menos."""
+        scores: Dict[str, float] = {}
+        for key in keys:
+            candidates = [
+                (vector_id, self.minhasher.unpack(packed))
+                for vector_id, packed in indexed.get(key, ())
+            ] + in_batch.get(key, [])
+            for vector_id, candidate in candidates:
+                if vector_id in scores:
+                    continue
+                scores[vector_id] = self.minhasher.similarity(signature, candidate)
+        matches = [
+            vector_id for vector_id, score in scores.items() if score >= self.near_dedup_threshold
+        ]
+        return sorted(matches, key=lambda vector_id: (-scores[vector_id], vector_id))
 
-    def query(self, question: str, top_k: int = 5) -> Dict[str, Any]:
-        """Busca documentos relevantes e gera resposta."""
-        docs = self.vectorstore.similarity_search(question, k=top_k)
-        unique_docs = self._deduplicate_documents(docs)
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """Lista os documentos indexados registrados no catalogo."""
+        return self.catalog.list_documents()
+
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna os metadados de um documento (inclusive ids dos chunks)."""
+        return self.catalog.get(doc_id)
+
+    def _release_document(self, doc_id: str) -> None:
+        """Apaga os vetores exclusivos do documento e o remove do catalogo."""
+        with self._index_lock.write():
+            orphans, shared = self._detach_documents([doc_id])
+            self.catalog.record_changes(orphans + list(shared), [doc_id])
+            self._delete_vectors(orphans)
+            self._reassign_vectors(shared)
+            self.catalog.clear_purges(orphans)
+
+    def _release_plan(
+        self, doc_ids: Sequence[str]
+    ) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, Any]]]:
+        """Vetores orfaos (por documento) e compartilhados caso ``doc_ids`` saiam juntos."""
+        orphans_by_doc: Dict[str, List[str]] = {}
+        shared: Dict[str, Dict[str, Any]] = {}
+        for doc_id in doc_ids:
+            orphans, doc_shared = self.catalog.release_plan(doc_id, ignore_doc_ids=doc_ids)
+            orphans_by_doc[doc_id] = orphans
+            shared.update(doc_shared)
+        return orphans_by_doc, shared
+
+    def _detach_documents(
+        self,
+        doc_ids: Sequence[str],
+        plan: Optional[Tuple[Dict[str, List[str]], Dict[str, Dict[str, Any]]]] = None,
+    ) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+        """Remove documentos do catalogo e retorna os vetores a apagar/reatribuir.
+
+        Chamado sob o lock de escrita; ``plan`` reaproveita um
+        :meth:`_release_plan` calculado antes (o escritor e unico, entao o
+        catalogo nao mudou). Os vetores orfaos ficam registrados em
+        ``pending_purges`` ate serem apagados do vectorstore; se o processo
+        cair antes disso, ``_recover_catalog`` conclui a remocao.
+        """
+        if not doc_ids:
+            return [], {}
+        for doc_id in doc_ids:
+            self.catalog.mark_deleting(doc_id)
+        orphans_by_doc, shared = plan if plan is not None else self._release_plan(doc_ids)
+
+        for doc_id in doc_ids:
+            self.catalog.remove(doc_id, released_vector_ids=orphans_by_doc[doc_id])
+        all_orphans = list(
+            dict.fromkeys(vector_id for orphans in orphans_by_doc.values() for vector_id in orphans)
+        )
+        return all_orphans, shared
+
+    def _reassign_vectors(self, shared: Dict[str, Dict[str, Any]]) -> None:
+        """Aponta os metadados de vetores compartilhados para um documento remanescente."""
+        if not shared:
+            return
+        try:
+            self.vectorstore._collection.update(  # type: ignore[attr-defined]
+                ids=list(shared),
+                metadatas=[
+                    {
+                        "source": owner["source"],
+                        "chunk_id": owner["position"],
+                        "doc_id": owner["doc_id"],
+                    }
+                    for owner in shared.values()
+                ],
+            )
+        except Exception:  # noqa: BLE001 - metadados desatualizados nao impedem a remocao
+            self.logger.exception("Falha ao reatribuir %d vetores compartilhados", len(shared))
+
+    @staticmethod
+    def _vector_id(doc_id: str, chunk_id: int) -> str:
+        return f"{doc_id}:{chunk_id}"
+
+    def _delete_vectors(self, vector_ids: List[str]) -> None:
+        if vector_ids:
+            self.vectorstore.delete(ids=vector_ids)
+
+    def _migrate_legacy_vectors(self) -> None:
+        """Cataloga, uma unica vez, vetores indexados antes do catalogo e dos digests."""
+        if self.catalog.get_meta(_LEGACY_BACKFILL_KEY) is not None:
+            return
+        count = self._backfill_legacy_vectors()
+        if count:
+            self.logger.info("%d documentos anteriores ao catalogo foram catalogados.", count)
+        self.catalog.set_meta(_LEGACY_BACKFILL_KEY, datetime.now(timezone.utc).isoformat())
+
+        if self.catalog.get_meta(_DIGEST_BACKFILL_KEY) is not None:
+            return
+        count = self._backfill_text_digests()
+        if count:
+            self.logger.info("Digest do texto calculado para %d vetores anteriores.", count)
+        self.catalog.set_meta(_DIGEST_BACKFILL_KEY, datetime.now(timezone.utc).isoformat())
+
+    def _backfill_text_digests(self, page_size: int = 1000) -> int:
+        """Registra o digest do texto dos vetores indexados antes dos digests.
+
+        Sem ele, um upload com texto identico a esses vetores seria tratado
+        como quase duplicado e ganharia um vetor proprio com o mesmo texto.
+        """
+        collection = self.vectorstore._collection  # type: ignore[attr-defined]
+        missing = self.catalog.vectors_without_digest()
+        for start in range(0, len(missing), page_size):
+            page = collection.get(ids=missing[start : start + page_size], include=["documents"])
+            self.catalog.add_digests(
+                [
+                    (vector_id, text_digest(text or ""))
+                    for vector_id, text in zip(page["ids"], page["documents"])
+                ]
+            )
+        return len(missing)
+
+    def _backfill_legacy_vectors(self, page_size: int = 5000) -> int:
+        """Registra no catalogo os vetores sem entrada, agrupados pelo doc_id dos metadados.
+
+        Assim reuploads e remocoes desses documentos usam os ids explicitos,
+        sem filtros ``where`` que varrem a colecao.
+        """
+        collection = self.vectorstore._collection  # type: ignore[attr-defined]
+        legacy: Dict[str, List[Tuple[int, str, str]]] = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            known = self.catalog.known_vector_ids(page["ids"])
+            for vector_id, metadata in zip(page["ids"], page["metadatas"]):
+                metadata = metadata or {}
+                doc_id = metadata.get("doc_id")
+                if vector_id in known or not doc_id:
+                    continue
+                legacy.setdefault(doc_id, []).append(
+                    (metadata.get("chunk_id", 0), vector_id, metadata.get("source", ""))
+                )
+            offset += len(page["ids"])
+
+        documents = []
+        for doc_id, entries in legacy.items():
+            if self.catalog.vector_ids(doc_id):
+                continue
+            entries.sort()
+            documents.append(
+                {
+                    "doc_id": doc_id,
+                    "source": entries[0][2],
+                    "chunk_ids": [vector_id for _, vector_id, _ in entries],
+                    "indexed_at": None,
+                }
+            )
+        if documents:
+            self.catalog.restore(documents)
+        return len(documents)
+
+    def _rollback_batch(self) -> None:
+        """Desfaz um lote que falhou no meio e agenda a publicacao do resultado."""
+        self._recover_catalog()
+        self._schedule_generation()
+
+    def _recover_catalog(self) -> None:
+        """Desfaz escritas interrompidas para manter catalogo e vectorstore consistentes."""
+        purges = self.catalog.pending_purges()
+        if purges:
+            self.logger.warning("Concluindo remocao interrompida de %d vetores.", len(purges))
+            self.catalog.record_changes(purges)
+            self._delete_vectors(purges)
+            self.catalog.clear_purges(purges)
+
+        incomplete = self.catalog.incomplete()
+        for doc_id, vector_ids in incomplete:
+            self.logger.warning(
+                "Recuperando escrita interrompida do doc_id %s (%d chunks).",
+                doc_id,
+                len(vector_ids),
+            )
+            self._release_document(doc_id)
+        if incomplete or purges:
+            self.vectorstore.persist()
+
+    def export_snapshot(
+        self,
+        path: str,
+        dtype: str = "float16",
+        base_paths: Sequence[str] = (),
+        verify: bool = True,
+    ) -> Dict[str, Any]:
+        """Exporta vetores, textos e catalogo para um snapshot.
+
+        Com ``base_paths`` (snapshot completo seguido de deltas) gera apenas
+        o delta em relacao ao estado final dessa cadeia. ``verify=False``
+        confia nos checksums dos cabecalhos da cadeia em vez de reler cada
+        arquivo inteiro.
+        """
+        self._ensure_writable()
+        # Lock de leitura: o snapshot nunca captura um lote aplicado pela metade
+        with self._index_lock.read():
+            return self._export_snapshot(path, dtype, base_paths, verify)
+
+    def _export_snapshot(
+        self, path: str, dtype: str, base_paths: Sequence[str], verify: bool
+    ) -> Dict[str, Any]:
+        instance, revision = self.catalog.revision()
+        marker = {"instance": instance, "revision": revision}
+        if not base_paths:
+            return write_snapshot(
+                path,
+                self._iter_snapshot_records(),
+                dtype=dtype,
+                catalog=self.catalog.export_state(),
+                revision=marker,
+            )
+
+        chain = open_chain(base_paths, verify=verify)
+        try:
+            parent = chain[-1].checksum
+            base = chain[-1].revision
+            if base is not None and base.get("instance") == instance:
+                changes = self._changes_since(base["revision"])
+            else:
+                self.logger.warning(
+                    "Base do delta sem revisao deste indice; todos os vetores serao reenviados."
+                )
+                changes = self._changes_against(chain)
+        finally:
+            for snapshot in chain:
+                snapshot.close()
+
+        vector_ids, deleted_ids, doc_ids, deleted_documents = changes
+        catalog_delta = self.catalog.export_state(doc_ids=doc_ids, vector_ids=vector_ids)
+        catalog_delta["deleted_documents"] = deleted_documents
+        return write_snapshot(
+            path,
+            self._iter_snapshot_records(vector_ids),
+            dtype=dtype,
+            kind="delta",
+            parent=parent,
+            deleted_ids=deleted_ids,
+            catalog=catalog_delta,
+            revision=marker,
+        )
+
+    def _changes_since(
+        self, revision: int, page_size: int = 5000
+    ) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """Vetores/documentos alterados (e removidos) depois de ``revision``.
+
+        Inclui vetores cujo texto ou metadados mudaram sem mudar de id, como
+        os reatribuidos a outro documento quando o dono original sai.
+        """
+        changed_vectors, changed_documents = self.catalog.changes_since(revision)
+        collection = self.vectorstore._collection  # type: ignore[attr-defined]
+        present = set()
+        for start in range(0, len(changed_vectors), page_size):
+            batch = changed_vectors[start : start + page_size]
+            present.update(collection.get(ids=batch, include=[])["ids"])
+        indexed = {doc["doc_id"] for doc in map(self.catalog.get, changed_documents) if doc}
+        return (
+            [vector_id for vector_id in changed_vectors if vector_id in present],
+            [vector_id for vector_id in changed_vectors if vector_id not in present],
+            [doc_id for doc_id in changed_documents if doc_id in indexed],
+            [doc_id for doc_id in changed_documents if doc_id not in indexed],
+        )
+
+    def _changes_against(
+        self, chain: Sequence[IndexSnapshot]
+    ) -> Tuple[List[str], List[str], List[str], List[str]]:
+        """Diferenca completa para bases sem revisao: reenvia todo o estado atual."""
+        base_ids, base_documents = chain_state(chain)
+        current_ids = list(self._iter_vector_ids())
+        current_documents = [doc["doc_id"] for doc in self.catalog.list_documents()]
+        return (
+            current_ids,
+            sorted(base_ids - set(current_ids)),
+            current_documents,
+            sorted(set(base_documents) - set(current_documents)),
+        )
+
+    def import_snapshot(self, paths: Sequence[str], batch_size: int = 1000) -> None:
+        """Carrega um snapshot completo e seus deltas sem recalcular embeddings.
+
+        O snapshot completo substitui o indice atual: vetores e documentos
+        ausentes dele sao removidos antes da carga. A importacao passa pela
+        fila de escrita, entre os lotes de indexacao e remocao.
+        """
+        self._ensure_writable()
+        self._submit({"op": "import", "paths": list(paths), "batch_size": batch_size})
 
-        sources = [
-            {
-                "text": doc.page_content[:200] + "...",
-                "source": doc.metadata.get("source", "unknown"),
-            }
-            for doc in unique_docs
+    def _import_snapshot(self, paths: Sequence[str], batch_size: int) -> None:
+        collection = self.vectorstore._collection  # type: ignore[attr-defined]
+        chain = open_chain(paths)
+        try:
+            with self._index_lock.write():
+                self._clear_index(batch_size)
+                for snapshot in chain:
+                    for start in range(0, len(snapshot.deleted_ids), batch_size):
+                        self._delete_vectors(snapshot.deleted_ids[start : start + batch_size])
+                    # Deltas regravam vetores alterados; a base nao precisa disso
+                    replaced = list(snapshot.deleted_ids) if snapshot.kind == "delta" else []
+                    for records, vectors in snapshot.iter_batches(batch_size):
+                        record_ids = [record["id"] for record in records]
+                        collection.upsert(
+                            ids=record_ids,
+                            embeddings=vectors.tolist(),
+                            documents=[record["text"] for record in records],
+                            metadatas=[record["metadata"] for record in records],
+                        )
+                        if snapshot.kind == "delta":
+                            replaced.extend(record_ids)
+                    catalog = snapshot.catalog()
+                    self.catalog.restore(
+                        catalog.get("documents", []),
+                        fingerprints=catalog.get("fingerprints", []),
+                        deleted_documents=catalog.get("deleted_documents", []),
+                        digests=catalog.get("digests", []),
+                        replaced_vector_ids=replaced,
+                    )
+                self.vectorstore.persist()
+        finally:
+            for snapshot in chain:
+                snapshot.close()
+
+    def _clear_index(self, batch_size: int) -> None:
+        """Remove todos os vetores e documentos (chamado sob o lock de escrita)."""
+        # Os vetores catalogados ficam em pending_purges: se o processo cair no meio,
+        # _recover_catalog conclui a limpeza
+        self.catalog.clear()
+        vector_ids = list(self._iter_vector_ids())
+        for start in range(0, len(vector_ids), batch_size):
+            self._delete_vectors(vector_ids[start : start + batch_size])
+        self.catalog.clear_purges(self.catalog.pending_purges())
+
+    def create_snapshot(self, incremental: bool = False, dtype: str = "float16") -> Dict[str, Any]:
+        """Gera um snapshot no diretorio padrao, encadeando deltas ao ultimo completo."""
+        base_paths = self._current_snapshot_chain() if incremental else []
+        kind = "delta" if base_paths else "full"
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        path = os.path.join(self.snapshot_directory, f"{timestamp}-{kind}{SNAPSHOT_SUFFIX}")
+        header = self.export_snapshot(path, dtype=dtype, base_paths=base_paths)
+        return self._describe_snapshot(path, header)
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        snapshots = []
+        for path in self._snapshot_paths():
+            with IndexSnapshot(path, verify=False) as snapshot:
+                snapshots.append(self._describe_snapshot(path, snapshot.header))
+        return snapshots
+
+    def snapshot_path(self, name: str) -> Optional[str]:
+        if os.path.basename(name) != name or not name.endswith(SNAPSHOT_SUFFIX):
+            return None
+        path = os.path.join(self.snapshot_directory, name)
+        return path if os.path.isfile(path) else None
+
+    def _snapshot_paths(self) -> List[str]:
+        if not os.path.isdir(self.snapshot_directory):
+            return []
+        return [
+            os.path.join(self.snapshot_directory, name)
+            for name in sorted(os.listdir(self.snapshot_directory))
+            if name.endswith(SNAPSHOT_SUFFIX)
         ]
 
+    def _current_snapshot_chain(self) -> List[str]:
+        """Ultimo snapshot completo seguido dos deltas gerados depois dele."""
+        chain: List[str] = []
+        for path in self._snapshot_paths():
+            with IndexSnapshot(path, verify=False) as snapshot:
+                if snapshot.kind == "full":
+                    chain = [path]
+                elif chain:
+                    chain.append(path)
+        return chain
+
+    @staticmethod
+    def _describe_snapshot(path: str, header: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "name": os.path.basename(path),
+            "kind": header["kind"],
+            "parent": header["parent"],
+            "checksum": header["checksum"],
+            "created_at": header["created_at"],
+            "dtype": header["dtype"],
+            "count": header["count"],
+            "deleted": len(header["deleted_ids"]),
+            "size_bytes": os.path.getsize(path),
+        }
+
+    def _iter_vector_ids(self, page_size: int = 5000) -> Iterator[str]:
+        collection = self.vectorstore._collection  # type: ignore[attr-defined]
+        offset = 0
+        while True:
+            page = collection.get(include=[], limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield from page["ids"]
+            offset += len(page["ids"])
+
+    def _iter_snapshot_records(
+        self, ids: Optional[List[str]] = None, page_size: int = 1000
+    ) -> Iterator[SnapshotRecord]:
+        """Le vetores do Chroma em paginas (todos ou apenas ``ids``)."""
+        collection = self.vectorstore._collection  # type: ignore[attr-defined]
+        include = ["embeddings", "documents", "metadatas"]
+        if ids is not None:
+            for start in range(0, len(ids), page_size):
+                page = collection.get(ids=ids[start : start + page_size], include=include)
+                yield from zip(
+                    page["ids"], page["embeddings"], page["documents"], page["metadatas"]
+                )
+            return
+        offset = 0
+        while True:
+            page = collection.get(include=include, limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+            yield from zip(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+            offset += len(page["ids"])
+
+    def query(
+        self,
+        question: str,
+        top_k: int = 5,
+        include_sources: bool = True,
+        source_chars: int = 200,
+    ) -> Dict[str, Any]:
+        """Busca documentos relevantes e gera resposta.
+
+        ``include_sources=False`` omite as fontes da resposta e
+        ``source_chars`` limita o trecho de cada uma (0 devolve apenas o nome).
+        """
+        with self._index_lock.read():
+            docs = self.vectorstore.similarity_search(question, k=top_k)
+        unique_docs = self._deduplicate_documents(docs)
+
+        sources = self._build_sources(unique_docs, source_chars) if include_sources else []
+
         if self.llm.is_ready:
             try:
                 answer = self.llm.generate(question, unique_docs)
@@ -116,6 +1129,17 @@ class RAGEngine:
 
         return {"answer": answer, "sources": sources}
 
+    @staticmethod
+    def _build_sources(documents: List[Any], source_chars: int) -> List[Dict[str, Any]]:
+        sources = []
+        for doc in documents:
+            source: Dict[str, Any] = {}
+            if source_chars > 0:
+                source["text"] = doc.page_content[:source_chars] + "..."
+            source["source"] = doc.metadata.get("source", "unknown")
+            sources.append(source)
+        return sources
+
     def _deduplicate_documents(self, documents: List[Any]) -> List[Any]:
         """Remove duplicated chunks while preserving the original ranking order."""
 
@@ -146,10 +1170,22 @@ class RAGEngine:
                 "Usando embeddings deterministicas em modo offline. Defina RAG_ENABLE_HF_EMBEDDINGS=1 para usar HuggingFace."
             )
             return _DeterministicFallbackEmbeddings()
+        max_batch_size = int(os.getenv("RAG_EMBED_MAX_BATCH", "128"))
+        # Cada lote do agendador vira uma unica passada do modelo
+        factory = functools.partial(
+            HuggingFaceEmbeddings,
+            model_name="sentence-transformers/paraphrase-multilingual-mpnet-base-v2",
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"batch_size": max_batch_size},
+        )
         try:
-            return HuggingFaceEmbeddings(
-                model_name="sentence-transformers/paraphrase-multilingual-mpnet-base-v2",
-                model_kwargs={"device": "cpu"},
+            return LengthBucketedEmbeddings(
+                factory(),
+                token_budget=int(os.getenv("RAG_EMBED_TOKEN_BUDGET", "1024")),
+                max_batch_size=max_batch_size,
+                workers=int(os.getenv("RAG_EMBED_WORKERS", "0")),
+                threads_per_worker=int(os.getenv("RAG_EMBED_THREADS", "1")),
+                worker_factory=factory,
             )
         except Exception as exc:  # noqa: BLE001 - fallback para execucao offline
             self.logger.warning(
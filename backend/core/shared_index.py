@@ -0,0 +1,346 @@
+"""Indice somente leitura compartilhado entre workers via geracoes publicadas.
+
+Um unico processo escritor indexa no Chroma e publica *geracoes* em
+``generations/``: um snapshot completo (ver ``index_snapshot``) seguido de
+deltas pequenos, com as mudancas desde a geracao anterior. O arquivo
+``CURRENT`` lista a cadeia atual (completo primeiro, um nome por linha).
+O escritor agrupa as escritas (no maximo uma geracao por intervalo) e
+compacta a cadeia em um novo snapshot completo quando os deltas crescem.
+
+Os workers de consulta nunca abrem o diretorio do Chroma; mapeiam os
+snapshots da cadeia em memoria (as paginas ficam no page cache e sao
+compartilhadas entre processos) e trocam para a cadeia mais nova sem
+reiniciar. Quando so chegam deltas, o snapshot completo ja carregado e
+reaproveitado.
+
+A busca na geracao completa e exata (O(N x dim) por consulta) ate
+``RAG_INDEX_ANN_MIN`` vetores; acima disso o escritor grava junto dela um
+indice IVF (ver ``vector_index``), tambem mapeado em memoria pelos workers,
+e apenas as ``nprobe`` listas mais proximas sao comparadas.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+
+try:  # compatibilidade ao importar via "backend.core" ou diretamente de "core"
+    from backend.core.index_snapshot import SNAPSHOT_SUFFIX, IndexSnapshot, SnapshotError
+    from backend.core.vector_index import IVFIndex
+except ModuleNotFoundError:  # pragma: no cover - caminho utilizado na execucao direta
+    from core.index_snapshot import SNAPSHOT_SUFFIX, IndexSnapshot, SnapshotError  # type: ignore
+    from core.vector_index import IVFIndex  # type: ignore
+
+CURRENT_FILE = "CURRENT"
+_GENERATION_PATTERN = re.compile(r"^gen-(\d+)(-delta)?" + re.escape(SNAPSHOT_SUFFIX) + "$")
+# Snapshots e arquivos auxiliares (indice IVF) de cada geracao
+_ARTIFACT_PATTERN = re.compile(r"^gen-(\d+)[.-]")
+_SEARCH_BLOCK = 8192
+
+
+class ReadOnlyIndexError(RuntimeError):
+    """Escrita solicitada em um no que apenas serve consultas."""
+
+
+def read_current_chain(directory: str) -> List[str]:
+    """Cadeia publicada: geracao completa seguida dos deltas, em ordem."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), "r", encoding="utf-8") as handle:
+            return [line.strip() for line in handle if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def read_current_generation(directory: str) -> Optional[str]:
+    chain = read_current_chain(directory)
+    return chain[-1] if chain else None
+
+
+class GenerationPublisher:
+    """Publica geracoes do indice para os workers de leitura.
+
+    ``keep`` e o numero de cadeias (geracao completa + deltas) mantidas em
+    disco; as mais antigas sao removidas a cada nova geracao completa.
+    """
+
+    def __init__(self, directory: str, keep: int = 3) -> None:
+        self.directory = directory
+        self.keep = max(keep, 1)
+        os.makedirs(directory, exist_ok=True)
+
+    def _generations(self) -> List[Tuple[int, bool, str]]:
+        generations = []
+        for name in os.listdir(self.directory):
+            match = _GENERATION_PATTERN.match(name)
+            if match:
+                generations.append((int(match.group(1)), match.group(2) is None, name))
+        return sorted(generations)
+
+    def chain(self) -> List[str]:
+        return read_current_chain(self.directory)
+
+    def chain_paths(self) -> List[str]:
+        return [os.path.join(self.directory, name) for name in self.chain()]
+
+    def publish(self, export: Callable[[str], Dict[str, Any]]) -> str:
+        """Exporta uma nova geracao completa com ``export(path)`` e a torna a atual."""
+        name = self._next_name(delta=False)
+        export(os.path.join(self.directory, name))
+        self._point_to([name])
+        self._prune()
+        return name
+
+    def publish_delta(self, export: Callable[[str, List[str]], Dict[str, Any]]) -> str:
+        """Exporta um delta da cadeia atual com ``export(path, base_paths)``."""
+        chain = self.chain()
+        if not chain:
+            raise SnapshotError("nao ha geracao completa para servir de base ao delta")
+        name = self._next_name(delta=True)
+        export(os.path.join(self.directory, name), self.chain_paths())
+        self._point_to(chain + [name])
+        return name
+
+    def _next_name(self, delta: bool) -> str:
+        generations = self._generations()
+        number = generations[-1][0] + 1 if generations else 1
+        return f"gen-{number:010d}{'-delta' if delta else ''}{SNAPSHOT_SUFFIX}"
+
+    def _point_to(self, chain: List[str]) -> None:
+        pointer = os.path.join(self.directory, CURRENT_FILE)
+        tmp_pointer = f"{pointer}.tmp"
+        with open(tmp_pointer, "w", encoding="utf-8") as handle:
+            handle.write("\n".join(chain) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_pointer, pointer)
+
+    def _prune(self) -> None:
+        generations = self._generations()
+        full = [number for number, is_full, _ in generations if is_full]
+        if len(full) <= self.keep:
+            return
+        oldest_kept = full[-self.keep]
+        # Workers ainda presos a geracoes antigas mantem o mmap valido apos a remocao.
+        for name in os.listdir(self.directory):
+            match = _ARTIFACT_PATTERN.match(name)
+            if match is None or int(match.group(1)) >= oldest_kept:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class _ChainView:
+    """Estado consultavel de uma cadeia: base mapeada e deltas ja mesclados."""
+
+    def __init__(
+        self,
+        base: IndexSnapshot,
+        base_norms: np.ndarray,
+        base_index: Optional[IVFIndex],
+        deltas: List[IndexSnapshot],
+    ) -> None:
+        self.base = base
+        self.base_norms = base_norms
+        self.base_index = base_index
+        self.deltas = deltas
+        # Ids da base alterados ou removidos pelos deltas nao podem ser devolvidos dela
+        self.masked: Set[str] = set()
+        live: Dict[str, Tuple[IndexSnapshot, int]] = {}
+        for delta in deltas:
+            for vector_id in delta.deleted_ids:
+                live.pop(vector_id, None)
+                self.masked.add(vector_id)
+            for index, vector_id in enumerate(delta.ids()):
+                live[vector_id] = (delta, index)
+                self.masked.add(vector_id)
+        self.delta_rows = list(live.values())
+        if self.delta_rows:
+            self.delta_vectors = np.stack(
+                [
+                    np.asarray(snapshot.vectors[index], dtype=np.float32)
+                    for snapshot, index in self.delta_rows
+                ]
+            )
+        else:
+            self.delta_vectors = np.empty((0, base.dim), dtype=np.float32)
+        self.delta_norms = np.einsum("ij,ij->i", self.delta_vectors, self.delta_vectors)
+
+    @property
+    def count(self) -> int:
+        return self.base.count + len(self.delta_rows)
+
+
+class SharedIndex:
+    """Busca vetorial sobre a cadeia publicada, com interface de ``similarity_search``.
+
+    A distancia e L2 (a mesma usada por padrao pelo Chroma). Os vetores da
+    geracao completa sao lidos diretamente do mmap em blocos, entao cada
+    worker so aloca a norma de cada vetor e buffers temporarios por
+    consulta; os deltas, pequenos, ficam mesclados em memoria.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embeddings: Any,
+        refresh_interval: float = 2.0,
+        nprobe: int = 8,
+    ) -> None:
+        self.directory = directory
+        self.embeddings = embeddings
+        self.refresh_interval = refresh_interval
+        self.nprobe = nprobe
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._checked_at = float("-inf")
+        self._chain: List[str] = []
+        self._state: Optional[_ChainView] = None
+        self.refresh(force=True)
+
+    @property
+    def generation(self) -> Optional[str]:
+        return self._chain[-1] if self._chain else None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Troca para a cadeia mais nova, se houver. Retorna ``True`` se trocou."""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return False
+        with self._lock:
+            if not force and now - self._checked_at < self.refresh_interval:
+                return False
+            self._checked_at = now
+            chain = read_current_chain(self.directory)
+            if not chain or chain == self._chain:
+                return False
+            try:
+                state = self._load_chain(chain)
+            except (OSError, ValueError):
+                self.logger.exception(
+                    "Falha ao carregar a geracao %s; mantendo a atual.", chain[-1]
+                )
+                return False
+            self._state = state
+            self._chain = chain
+            self.logger.info(
+                "Indice compartilhado na geracao %s (%d vetores, %d delta(s)).",
+                chain[-1],
+                state.count,
+                len(state.deltas),
+            )
+            return True
+
+    def _load_chain(self, chain: List[str]) -> _ChainView:
+        paths = [os.path.join(self.directory, name) for name in chain]
+        current = self._state
+        if current is not None and self._chain and self._chain[0] == chain[0]:
+            # So chegaram deltas: a base mapeada (normas e indice IVF) continua valida
+            base, base_norms, base_index = current.base, current.base_norms, current.base_index
+        else:
+            base = IndexSnapshot(paths[0])
+            if base.kind != "full":
+                raise SnapshotError(f"{chain[0]} nao e uma geracao completa")
+            base_norms = self._squared_norms(base.vectors)
+            base_index = IVFIndex.load(paths[0])
+
+        deltas: List[IndexSnapshot] = []
+        parent = base.checksum
+        for path in paths[1:]:
+            delta = IndexSnapshot(path)
+            if delta.parent != parent:
+                raise SnapshotError(f"{path} nao e delta da geracao anterior")
+            deltas.append(delta)
+            parent = delta.checksum
+        return _ChainView(base, base_norms, base_index, deltas)
+
+    @staticmethod
+    def _squared_norms(vectors: np.ndarray) -> np.ndarray:
+        norms = np.empty(vectors.shape[0], dtype=np.float32)
+        for start in range(0, vectors.shape[0], _SEARCH_BLOCK):
+            block = np.asarray(vectors[start : start + _SEARCH_BLOCK], dtype=np.float32)
+            norms[start : start + _SEARCH_BLOCK] = np.einsum("ij,ij->i", block, block)
+        return norms
+
+    def similarity_search(self, query: str, k: int = 5) -> List[Document]:
+        self.refresh()
+        state = self._state
+        if state is None or state.count == 0 or k <= 0:
+            return []
+
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        hits = self._search_base(state, query_vector, k) + self._search_deltas(
+            state, query_vector, k
+        )
+        hits.sort(key=lambda hit: hit[0])
+        return [
+            Document(page_content=record["text"], metadata=record["metadata"])
+            for _, record in hits[:k]
+        ]
+
+    def _search_base(
+        self, state: _ChainView, query_vector: np.ndarray, k: int
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        snapshot = state.base
+        if snapshot.count == 0:
+            return []
+        # Vetores substituidos pelos deltas podem ocupar as primeiras posicoes
+        wanted = min(snapshot.count, k + len(state.masked))
+        if state.base_index is not None:
+            rows = np.sort(state.base_index.probe(query_vector, self.nprobe))
+            if rows.size >= wanted:
+                block = np.asarray(snapshot.vectors[rows], dtype=np.float32)
+                distances = state.base_norms[rows] - 2.0 * (block @ query_vector)
+                return self._rank(snapshot, rows, distances, state.masked, k, wanted)
+
+        distances = np.empty(snapshot.count, dtype=np.float32)
+        for start in range(0, snapshot.count, _SEARCH_BLOCK):
+            block = np.asarray(snapshot.vectors[start : start + _SEARCH_BLOCK], dtype=np.float32)
+            distances[start : start + _SEARCH_BLOCK] = (
+                state.base_norms[start : start + _SEARCH_BLOCK] - 2.0 * (block @ query_vector)
+            )
+        return self._rank(snapshot, None, distances, state.masked, k, wanted)
+
+    @staticmethod
+    def _rank(
+        snapshot: IndexSnapshot,
+        rows: Optional[np.ndarray],
+        distances: np.ndarray,
+        masked: Set[str],
+        k: int,
+        wanted: int,
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        """Os ``k`` mais proximos entre ``distances`` (linhas ``rows`` do snapshot)."""
+        wanted = min(wanted, distances.shape[0])
+        nearest = np.argpartition(distances, wanted - 1)[:wanted]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        hits: List[Tuple[float, Dict[str, Any]]] = []
+        for position in nearest:
+            row = int(rows[position]) if rows is not None else int(position)
+            record = snapshot.record(row)
+            if record["id"] in masked:
+                continue
+            hits.append((float(distances[position]), record))
+            if len(hits) == k:
+                break
+        return hits
+
+    @staticmethod
+    def _search_deltas(
+        state: _ChainView, query_vector: np.ndarray, k: int
+    ) -> List[Tuple[float, Dict[str, Any]]]:
+        if not state.delta_rows:
+            return []
+        distances = state.delta_norms - 2.0 * (state.delta_vectors @ query_vector)
+        nearest = np.argsort(distances, kind="stable")[:k]
+        return [
+            (float(distances[index]), state.delta_rows[index][0].record(state.delta_rows[index][1]))
+            for index in nearest
+        ]
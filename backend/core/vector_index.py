@@ -0,0 +1,138 @@
+"""Indice IVF (inverted file) para a busca aproximada dos workers de leitura.
+
+Os vetores de uma geracao completa sao agrupados por k-means em ``nlist``
+listas; a consulta compara o vetor apenas com os centroides e depois com
+os vetores das ``nprobe`` listas mais proximas, em vez de varrer o indice
+inteiro.
+
+O indice guarda apenas centroides, offsets e a ordem das linhas do
+snapshot, em arquivos ``.npy`` ao lado dele. Os workers os abrem com
+``np.load(mmap_mode="r")``: assim como os vetores do snapshot, as paginas
+ficam no page cache e sao compartilhadas entre processos, sem uma copia do
+indice por worker (o que descartou HNSW, cujo grafo precisa ser carregado
+em memoria por processo).
+"""
+from __future__ import annotations
+
+import math
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+try:  # compatibilidade ao importar via "backend.core" ou diretamente de "core"
+    from backend.core.index_snapshot import SNAPSHOT_SUFFIX
+except ModuleNotFoundError:  # pragma: no cover - caminho utilizado na execucao direta
+    from core.index_snapshot import SNAPSHOT_SUFFIX  # type: ignore
+
+_BLOCK = 8192
+_ARRAYS = ("centroids", "offsets", "rows")
+
+
+def index_paths(snapshot_path: str) -> Dict[str, str]:
+    """Arquivos do indice IVF de um snapshot (``gen-N.ivf.<array>.npy``)."""
+    stem = snapshot_path
+    if stem.endswith(SNAPSHOT_SUFFIX):
+        stem = stem[: -len(SNAPSHOT_SUFFIX)]
+    return {name: f"{stem}.ivf.{name}.npy" for name in _ARRAYS}
+
+
+def _nearest_centroid(
+    vectors: np.ndarray, centroids: np.ndarray, centroid_norms: np.ndarray
+) -> np.ndarray:
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _BLOCK):
+        block = np.asarray(vectors[start : start + _BLOCK], dtype=np.float32)
+        # |c|^2 - 2 v.c ordena como a distancia L2 (|v|^2 e constante por linha)
+        labels[start : start + _BLOCK] = np.argmin(
+            centroid_norms[None, :] - 2.0 * (block @ centroids.T), axis=1
+        )
+    return labels
+
+
+def _kmeans(
+    sample: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _nearest_centroid(sample, centroids, np.einsum("ij,ij->i", centroids, centroids))
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=nlist)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        centroids[filled] = np.add.reduceat(sample[order], starts, axis=0) / counts[filled, None]
+        # Listas vazias recomecam de pontos aleatorios da amostra
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            centroids[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """Listas invertidas sobre as linhas de um snapshot."""
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray) -> None:
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self._centroid_norms = np.einsum(
+            "ij,ij->i", np.asarray(centroids, np.float32), np.asarray(centroids, np.float32)
+        )
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @staticmethod
+    def default_nlist(count: int) -> int:
+        return max(int(math.sqrt(count)), 1)
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        iterations: int = 10,
+        sample_size: int = 65536,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """Treina os centroides em uma amostra e distribui todas as linhas."""
+        count = vectors.shape[0]
+        nlist = min(nlist or cls.default_nlist(count), count)
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(count, min(count, max(sample_size, nlist)), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+        centroids = _kmeans(sample, nlist, iterations, rng)
+
+        labels = _nearest_centroid(vectors, centroids, np.einsum("ij,ij->i", centroids, centroids))
+        rows = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(labels, minlength=nlist))
+        return cls(centroids, offsets, rows)
+
+    def save(self, snapshot_path: str) -> None:
+        """Grava os arrays ao lado do snapshot (antes de a geracao ser publicada)."""
+        for name, path in index_paths(snapshot_path).items():
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as handle:
+                np.save(handle, getattr(self, name))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, snapshot_path: str) -> Optional["IVFIndex"]:
+        """Abre o indice do snapshot via mmap; ``None`` se a geracao nao tiver um."""
+        paths = index_paths(snapshot_path)
+        if not all(os.path.exists(path) for path in paths.values()):
+            return None
+        return cls(*(np.load(paths[name], mmap_mode="r") for name in _ARRAYS))
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Linhas do snapshot nas ``nprobe`` listas mais proximas da consulta."""
+        nprobe = min(max(nprobe, 1), self.nlist)
+        scores = self._centroid_norms - 2.0 * (np.asarray(self.centroids, np.float32) @ query)
+        lists = np.argpartition(scores, nprobe - 1)[:nprobe]
+        return np.concatenate(
+            [self.rows[self.offsets[idx] : self.offsets[idx + 1]] for idx in lists]
+        )
@@ -0,0 +1,34 @@
+"""Configuracao do Gunicorn para o modo de producao com varios workers.
+
+O app e carregado uma unica vez no processo mestre (``preload_app``), com
+modelos de embedding/LLM e o mmap da geracao atual do indice; os workers
+sao criados por ``fork`` e compartilham essa memoria via copy-on-write.
+Use com ``RAG_ROLE=reader``: a ingestao fica a cargo de um unico processo
+com ``RAG_ROLE=writer``, que publica novas geracoes do indice.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.getenv("RAG_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("RAG_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("RAG_WORKER_TIMEOUT", "120"))
+
+
+def pre_fork(server, worker):
+    # Objetos criados durante o carregamento nao sao mais visitados pelo GC,
+    # evitando que a contagem de referencias "suje" paginas compartilhadas.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Cada worker usa poucas threads para nao disputar os mesmos nucleos.
+    threads = int(os.getenv("RAG_WORKER_THREADS", "1"))
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:  # pragma: no cover - torch e dependencia do projeto
+        pass
@@ -1,31 +1,89 @@
+import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Any
 import uvicorn
 
+try:  # orjson e opcional: sem ele usamos o json da biblioteca padrao
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None  # type: ignore[assignment]
+
 try:  # Permite executar como pacote ou script isolado
     from backend.core.rag_engine import RAGEngine
     from backend.core.document_processor import DocumentProcessor
+    from backend.core.shared_index import ReadOnlyIndexError
 except ModuleNotFoundError:  # pragma: no cover - compatibilidade para execucao direta
     from core.rag_engine import RAGEngine  # type: ignore
     from core.document_processor import DocumentProcessor  # type: ignore
+    from core.shared_index import ReadOnlyIndexError  # type: ignore
 
 
 
 class UTF8JSONResponse(JSONResponse):
-    """Default JSON response configured to advertise UTF-8 encoding."""
+    """Default JSON response configured to advertise UTF-8 encoding.
+
+    Serializes with orjson when available (UTF-8 output, no ASCII escaping),
+    falling back to the stdlib encoder used by Starlette.
+    """
 
     media_type = "application/json; charset=utf-8"
 
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class _JSONGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if not content_type.startswith("application/json"):
+                # Mesmo caminho de respostas ja codificadas: o corpo passa sem gzip
+                self.content_encoding_set = True
+
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """Comprime apenas respostas JSON.
+
+    Downloads binarios (snapshots de varios GB em float16) quase nao
+    diminuem com gzip, gastariam CPU e perderiam o ``Content-Length``.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = _JSONGZipResponder(
+                self.app, self.minimum_size, compresslevel=self.compresslevel
+            )
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    yield
+    # Conclui escritas enfileiradas e publica a ultima geracao para os leitores
+    await run_in_threadpool(rag_engine.close)
+
 
 app = FastAPI(
     title="IA Corporativa PMEs",
     version="0.1.0",
     default_response_class=UTF8JSONResponse,
+    lifespan=lifespan,
 )
 
 # CORS para desenvolvimento
@@ -36,6 +94,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressao apenas para respostas JSON grandes (ex.: muitas fontes)
+app.add_middleware(JSONGZipMiddleware, minimum_size=int(os.getenv("RAG_GZIP_MIN_BYTES", "1024")))
+
 # Inicializar componentes
 rag_engine = RAGEngine()
 doc_processor = DocumentProcessor()
@@ -44,6 +105,8 @@ doc_processor = DocumentProcessor()
 class QueryRequest(BaseModel):
     question: str
     top_k: int = 5
+    include_sources: bool = True
+    source_chars: int = Field(200, ge=0)
 
 
 class QueryResponse(BaseModel):
@@ -51,15 +114,27 @@ class QueryResponse(BaseModel):
     sources: List[Dict[str, Any]]
 
 
+class SnapshotRequest(BaseModel):
+    incremental: bool = False
+    dtype: str = "float16"
+
+
 @app.post("/api/v1/query", response_model=QueryResponse)
 async def query_documents(request: QueryRequest):
     """Busca informações nos documentos indexados"""
     try:
-        results = rag_engine.query(request.question, request.top_k)
-        return QueryResponse(
-            answer=results["answer"],
-            sources=results["sources"],
+        # Consultas aguardam o lock de leitura enquanto um lote e gravado; fora do
+        # event loop, as demais requisicoes seguem atendidas
+        results = await run_in_threadpool(
+            rag_engine.query,
+            request.question,
+            request.top_k,
+            include_sources=request.include_sources,
+            source_chars=request.source_chars,
         )
+        # O dicionario ja esta no formato de QueryResponse; retornar a resposta
+        # diretamente evita a revalidacao/serializacao extra do Pydantic.
+        return UTF8JSONResponse({"answer": results["answer"], "sources": results["sources"]})
     except Exception as e:  # noqa: BLE001 - expor erro simplificado via HTTPException
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -78,13 +153,80 @@ async def upload_document(file: UploadFile = File(...)):
         # Processar e indexar
         content = await file.read()
         chunks = doc_processor.process_document(content, filename)
-        rag_engine.index_documents(chunks)
+        # Em thread separada: uploads concorrentes sao agrupados pela fila de escrita
+        report = await run_in_threadpool(rag_engine.index_documents, chunks)
+
+        response = {"status": "success", "chunks_indexed": len(chunks)}
+        if report:
+            response["deduplication"] = report
+        return response
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:  # noqa: BLE001
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"status": "success", "chunks_indexed": len(chunks)}
+
+@app.get("/api/v1/documents")
+async def list_documents():
+    """Lista os documentos indexados"""
+    documents = rag_engine.list_documents()
+    return {"documents": documents, "total": len(documents)}
+
+
+@app.get("/api/v1/documents/{doc_id}")
+async def get_document(doc_id: str):
+    """Detalhes de um documento indexado"""
+    document = rag_engine.get_document(doc_id)
+    if document is None:
+        raise HTTPException(404, "Documento não encontrado")
+    return document
+
+
+@app.delete("/api/v1/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    """Remove um documento e seus chunks do índice"""
+    try:
+        deleted = await run_in_threadpool(rag_engine.delete_document, doc_id)
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:  # noqa: BLE001
+        raise HTTPException(status_code=500, detail=str(e))
+    if not deleted:
+        raise HTTPException(404, "Documento não encontrado")
+    return {"status": "deleted", "doc_id": doc_id}
+
+
+@app.post("/api/v1/snapshots")
+async def create_snapshot(request: SnapshotRequest):
+    """Gera um snapshot do índice (completo ou delta do último)"""
+    if request.dtype not in {"float16", "float32"}:
+        raise HTTPException(400, "dtype deve ser float16 ou float32")
+    try:
+        # A exportacao percorre o indice inteiro; fora do event loop, consultas seguem atendidas
+        return await run_in_threadpool(
+            rag_engine.create_snapshot, request.incremental, request.dtype
+        )
+    except ReadOnlyIndexError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:  # noqa: BLE001
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/v1/snapshots")
+async def list_snapshots():
+    """Lista os snapshots disponíveis para bootstrap de novos nós"""
+    return {"snapshots": rag_engine.list_snapshots()}
+
+
+@app.get("/api/v1/snapshots/{name}")
+async def download_snapshot(name: str):
+    """Download de um snapshot"""
+    path = rag_engine.snapshot_path(name)
+    if path is None:
+        raise HTTPException(404, "Snapshot não encontrado")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+
 @app.get("/api/v1/health")
 async def health_check():
     return {"status": "healthy"}
@@ -0,0 +1,125 @@
+"""Benchmark do agendamento de embeddings por comprimento de tokens.
+
+Compara ``HuggingFaceEmbeddings`` chamado com todos os chunks (lotes fixos de
+32 itens, caminho anterior) com o ``LengthBucketedEmbeddings`` em varios
+orcamentos de tokens e, opcionalmente, com processos auxiliares. O corpus
+mistura chunks curtos (titulos, rodapes) e longos (paragrafos inteiros).
+
+Sem acesso ao HuggingFace Hub, ``--synthetic`` monta um modelo com a mesma
+arquitetura (XLM-R base, 12 camadas, 768 dimensoes, 128 tokens) e pesos
+aleatorios: a vazao e representativa, os vetores nao.
+
+Uso: ``python benchmarks/bench_embedding.py [--chunks N] [--workers N] [--synthetic]``
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.embeddings import HuggingFaceEmbeddings  # noqa: E402
+
+from backend.core.embedding_scheduler import LengthBucketedEmbeddings  # noqa: E402
+
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+WORDS = (
+    "politica ferias filial contrato reembolso beneficio prazo colaborador gestor "
+    "documento relatorio financeiro auditoria seguranca acesso sistema cliente"
+).split()
+
+
+def _corpus(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(size):
+        # ~60% curtos, ~40% longos: distribuicao tipica de PDFs fatiados
+        words = rng.randint(3, 15) if rng.random() < 0.6 else rng.randint(60, 160)
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(words)))
+    return texts
+
+
+def _synthetic_model() -> str:
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast, XLMRobertaConfig, XLMRobertaModel
+
+    directory = tempfile.mkdtemp(prefix="bench-embed-model-")
+    vocab = {token: idx for idx, token in enumerate(["<s>", "<pad>", "</s>", "<unk>", *WORDS])}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="<s> $A </s>", special_tokens=[("<s>", 0), ("</s>", 2)]
+    )
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        bos_token="<s>",
+        eos_token="</s>",
+        pad_token="<pad>",
+        unk_token="<unk>",
+        model_max_length=128,
+    ).save_pretrained(directory)
+    XLMRobertaModel(XLMRobertaConfig(vocab_size=len(vocab), pad_token_id=1)).save_pretrained(
+        directory
+    )
+    return directory
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--budget", type=int, default=1024)
+    parser.add_argument("--synthetic", action="store_true")
+    args = parser.parse_args()
+
+    model_name = _synthetic_model() if args.synthetic else MODEL_NAME
+    factory = functools.partial(
+        HuggingFaceEmbeddings, model_name=model_name, model_kwargs={"device": "cpu"}
+    )
+    baseline = factory()
+    # Como em RAGEngine._load_embeddings: cada lote do agendador e uma unica passada
+    scheduled = factory(encode_kwargs={"batch_size": 128})
+    texts = _corpus(args.chunks)
+    for embeddings in (baseline, scheduled):
+        embeddings.client.max_seq_length = 128
+        embeddings.embed_documents(texts[:8])  # aquecimento
+
+    scenarios = [("lotes fixos de 32", baseline)]
+    for budget in (512, 1024, 2048, 4096):
+        scenarios.append(
+            (f"orcamento {budget}", LengthBucketedEmbeddings(scheduled, token_budget=budget))
+        )
+    if args.workers:
+        scenarios.append(
+            (
+                f"orcamento {args.budget}, {args.workers} proc.",
+                LengthBucketedEmbeddings(
+                    scheduled,
+                    token_budget=args.budget,
+                    workers=args.workers,
+                    worker_factory=functools.partial(
+                        factory, encode_kwargs={"batch_size": 128}
+                    ),
+                ),
+            )
+        )
+
+    print(f"{'cenario':<28}{'chunks/s':>10}")
+    for name, embeddings in scenarios:
+        if isinstance(embeddings, LengthBucketedEmbeddings) and embeddings.workers:
+            embeddings.embed_documents(texts[:8] * 4)  # sobe os processos fora da medicao
+        started = time.perf_counter()
+        embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<28}{len(texts) / elapsed:>10.1f}")
+        if isinstance(embeddings, LengthBucketedEmbeddings):
+            embeddings.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark do caminho de escrita com group commit.
+
+Mede a vazao de ingestao (documentos/s) com 1, 8 e 32 uploads concorrentes
+em dois caminhos:
+
+* ``anterior``: cada upload aplicado sozinho e em serie, como antes da fila
+  (os handlers rodavam no event loop): um embed, um upsert e um persist
+  por documento;
+* ``fila``: ``RAGEngine.index_documents`` com a fila de group commit.
+
+O agrupamento so compensa quando o custo fixo por chamada domina, como no
+modelo de embeddings (uma passada por lote em vez de uma por upload). Por
+isso o benchmark roda com as embeddings deterministicas (custo ~zero) e,
+com ``--hf``, com um modelo XLM-R base sintetico (ver
+``bench_embedding.py --synthetic``) em documentos curtos.
+
+Uso: ``python benchmarks/bench_ingestion.py [--documents N] [--chunks N] [--hf]``
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from backend.core.rag_engine import RAGEngine  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_embedding import WORDS, _synthetic_model  # noqa: E402
+
+
+def _chunks(doc_id: str, count: int, rng: random.Random):
+    return [
+        {
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 24))),
+            "source": f"{doc_id}.txt",
+            "doc_id": doc_id,
+        }
+        for _ in range(count)
+    ]
+
+
+def _hf_embeddings(model_name: str):
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    from backend.core.embedding_scheduler import LengthBucketedEmbeddings
+
+    # Mesma configuracao de RAGEngine._load_embeddings
+    base = HuggingFaceEmbeddings(
+        model_name=model_name, model_kwargs={"device": "cpu"}, encode_kwargs={"batch_size": 128}
+    )
+    base.client.max_seq_length = 128
+    embeddings = LengthBucketedEmbeddings(base)
+    embeddings.embed_documents(["aquecimento do modelo"])
+    return embeddings
+
+
+def _run(mode: str, uploaders: int, payloads, embeddings) -> float:
+    os.environ["RAG_DATA_DIR"] = tempfile.mkdtemp(prefix="bench-ingest-")
+    engine = RAGEngine()
+    if embeddings is not None:
+        engine.embeddings = embeddings
+    serial = threading.Lock()
+
+    def previous_path(chunks):
+        with serial:
+            return engine._apply_batch([{"op": "index", "chunks": chunks}])[0]
+
+    upload = previous_path if mode == "anterior" else engine.index_documents
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=uploaders) as pool:
+            list(pool.map(upload, payloads))
+        return time.perf_counter() - started
+    finally:
+        engine.ingestion.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=64)
+    parser.add_argument("--chunks", type=int, default=2)
+    parser.add_argument("--hf", action="store_true", help="usa o modelo XLM-R sintetico")
+    args = parser.parse_args()
+
+    embeddings = _hf_embeddings(_synthetic_model()) if args.hf else None
+    rng = random.Random(7)
+    payloads = [_chunks(f"doc{idx}", args.chunks, rng) for idx in range(args.documents)]
+
+    print(f"{'uploads':>8}{'anterior':>12}{'fila':>12}   (docs/s)")
+    for uploaders in (1, 8, 32):
+        rates = [
+            args.documents / _run(mode, uploaders, payloads, embeddings)
+            for mode in ("anterior", "fila")
+        ]
+        print(f"{uploaders:>8}{rates[0]:>12.1f}{rates[1]:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
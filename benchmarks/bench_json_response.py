@@ -0,0 +1,73 @@
+"""Benchmark da serializacao das respostas de /api/v1/query.
+
+Compara o caminho antigo (validacao em ``QueryResponse`` + ``jsonable_encoder``
++ json da biblioteca padrao) com o atual (dicionario direto + orjson) e o
+efeito de ``include_sources``/``source_chars`` e do gzip no tamanho do corpo.
+
+Uso: ``python benchmarks/bench_json_response.py [--requests N]``
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importar o app inicializa o RAGEngine; isolamos seus dados em um diretorio temporario.
+os.environ.setdefault("RAG_DATA_DIR", tempfile.mkdtemp(prefix="bench-json-"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from backend.main import QueryResponse, UTF8JSONResponse  # noqa: E402
+
+CHUNK = (
+    "Informação estratégica: a política de férias da filial de São Paulo prevê "
+    "30 dias corridos, com possibilidade de divisão em até três períodos. "
+) * 4
+
+
+def _payload(top_k: int, source_chars: int, include_sources: bool = True):
+    sources = [
+        {"text": CHUNK[:source_chars] + "...", "source": f"documento-{idx}.pdf"}
+        for idx in range(top_k)
+    ]
+    return {"answer": CHUNK, "sources": sources if include_sources else []}
+
+
+def _before(payload) -> bytes:
+    model = QueryResponse(answer=payload["answer"], sources=payload["sources"])
+    return JSONResponse(jsonable_encoder(model)).body
+
+
+def _after(payload) -> bytes:
+    return UTF8JSONResponse(payload).body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    scenarios = [
+        ("top_k=5, 200 chars", _payload(5, 200)),
+        ("top_k=20, 200 chars", _payload(20, 200)),
+        ("top_k=20, 80 chars", _payload(20, 80)),
+        ("top_k=20, sem fontes", _payload(20, 200, include_sources=False)),
+    ]
+    print(f"{'cenario':<24}{'antes (us)':>12}{'depois (us)':>13}{'bytes':>8}{'gzip':>8}")
+    for name, payload in scenarios:
+        before = timeit.timeit(lambda: _before(payload), number=args.requests)
+        after = timeit.timeit(lambda: _after(payload), number=args.requests)
+        body = _after(payload)
+        print(
+            f"{name:<24}{before / args.requests * 1e6:>12.1f}{after / args.requests * 1e6:>13.1f}"
+            f"{len(body):>8}{len(gzip.compress(body)):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark da busca dos workers de leitura (``SharedIndex``).
+
+Grava uma geracao completa com ``N`` vetores sinteticos agrupados
+(dim 768, float16, como o indice publicado pelo escritor), constroi o
+indice IVF e mede, por consulta:
+
+* ``exata``: varredura de todos os vetores mapeados (abaixo de
+  ``RAG_INDEX_ANN_MIN``);
+* ``ivf/nprobe``: apenas as listas mais proximas, com o recall@k em relacao
+  a busca exata.
+
+Uso: ``python benchmarks/bench_shared_index.py [--vectors N] [--queries N]``
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.core.index_snapshot import IndexSnapshot, write_snapshot  # noqa: E402
+from backend.core.shared_index import GenerationPublisher, SharedIndex  # noqa: E402
+from backend.core.vector_index import IVFIndex  # noqa: E402
+
+
+class _QueryTable:
+    """Consultas ja embutidas: o texto e o indice do vetor de consulta."""
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        self.vectors = vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[int(text)].tolist()
+
+
+def _clustered(rng: np.random.Generator, count: int, centers: np.ndarray) -> np.ndarray:
+    labels = rng.integers(centers.shape[0], size=count)
+    noise = rng.normal(scale=1.5, size=(count, centers.shape[1]))
+    return (centers[labels] + noise).astype(np.float32)
+
+
+def _records(rng: np.random.Generator, count: int, centers: np.ndarray):
+    for start in range(0, count, 8192):
+        block = _clustered(rng, min(8192, count - start), centers)
+        for offset, vector in enumerate(block):
+            yield (f"doc{start + offset}:0", vector, f"trecho {start + offset}", {})
+
+
+def _search(index: SharedIndex, queries: int, k: int):
+    results, started = [], time.perf_counter()
+    for query in range(queries):
+        results.append({doc.page_content for doc in index.similarity_search(str(query), k=k)})
+    return results, (time.perf_counter() - started) * 1000 / queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(1000, args.dim))
+    directory = tempfile.mkdtemp(prefix="bench-shared-")
+    try:
+        publisher = GenerationPublisher(directory)
+        started = time.perf_counter()
+        name = publisher.publish(
+            lambda path: write_snapshot(
+                path, _records(rng, args.vectors, centers), dtype="float16"
+            )
+        )
+        print(f"snapshot: {args.vectors} vetores em {time.perf_counter() - started:.1f}s")
+
+        path = os.path.join(directory, name)
+        started = time.perf_counter()
+        with IndexSnapshot(path, verify=False) as snapshot:
+            ivf = IVFIndex.build(snapshot.vectors)
+        ivf.save(path)
+        print(f"ivf: nlist={ivf.nlist} construido em {time.perf_counter() - started:.1f}s")
+
+        embeddings = _QueryTable(_clustered(rng, args.queries, centers))
+        exact_index = SharedIndex(directory, embeddings, refresh_interval=3600)
+        exact_index._state.base_index = None
+        exact, exact_ms = _search(exact_index, args.queries, args.k)
+        print(f"{'busca':>12}{'ms/consulta':>14}{'recall@' + str(args.k):>12}")
+        print(f"{'exata':>12}{exact_ms:>14.2f}{1.0:>12.3f}")
+
+        for nprobe in (4, 8, 16, 32, 64):
+            index = SharedIndex(directory, embeddings, refresh_interval=3600, nprobe=nprobe)
+            found, ms = _search(index, args.queries, args.k)
+            recall = np.mean([len(a & b) / args.k for a, b in zip(exact, found)])
+            print(f"{'ivf/' + str(nprobe):>12}{ms:>14.2f}{recall:>12.3f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
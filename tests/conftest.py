@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import pytest
+
+
+class FakeVectorStore:
+    """Vector store em memoria com a parte da API do Chroma usada pelo RAGEngine."""
+
+    def __init__(self) -> None:
+        # vector_id -> (embedding, texto, metadados)
+        self.records: Dict[str, tuple] = {}
+        self.upserts = 0
+        self.deleted_batches: List[List[str]] = []
+
+    @property
+    def _collection(self) -> "FakeVectorStore":
+        return self
+
+    @property
+    def vectors(self) -> Dict[str, str]:
+        return {vector_id: record[1] for vector_id, record in self.records.items()}
+
+    def metadata(self, vector_id: str) -> Dict[str, Any]:
+        return self.records[vector_id][2]
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        self.upserts += 1
+        for vector_id, embedding, text, metadata in zip(ids, embeddings, documents, metadatas):
+            self.records[vector_id] = (list(embedding), text, dict(metadata or {}))
+
+    def add_texts(self, texts, metadatas=None, ids=None) -> List[str]:
+        metadatas = metadatas or [{} for _ in texts]
+        self.upsert(ids, [[0.0] for _ in texts], texts, metadatas)
+        return list(ids)
+
+    def update(self, ids, metadatas) -> None:
+        for vector_id, metadata in zip(ids, metadatas):
+            embedding, text, _ = self.records[vector_id]
+            self.records[vector_id] = (embedding, text, dict(metadata))
+
+    def delete(self, ids=None, where=None) -> None:
+        if where is not None:
+            ids = [
+                vector_id
+                for vector_id, (_, _, metadata) in self.records.items()
+                if all(metadata.get(key) == value for key, value in where.items())
+            ]
+        self.deleted_batches.append(list(ids))
+        for vector_id in ids:
+            self.records.pop(vector_id, None)
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        include: Sequence[str] = ("documents", "metadatas"),
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, Any]:
+        if ids is None:
+            selected = sorted(self.records)[offset : None if limit is None else offset + limit]
+        else:
+            selected = [vector_id for vector_id in ids if vector_id in self.records]
+        page: Dict[str, Any] = {"ids": selected}
+        for field, index in (("embeddings", 0), ("documents", 1), ("metadatas", 2)):
+            if field in include:
+                page[field] = [self.records[vector_id][index] for vector_id in selected]
+        return page
+
+    def count(self) -> int:
+        return len(self.records)
+
+    def persist(self) -> None:
+        pass
+
+
+@pytest.fixture
+def fake_store() -> FakeVectorStore:
+    return FakeVectorStore()
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path, fake_store):
+    """RAGEngine isolado em ``tmp_path`` escrevendo no ``FakeVectorStore``."""
+    monkeypatch.setenv("RAG_DATA_DIR", str(tmp_path))
+    from backend.core.rag_engine import RAGEngine
+
+    rag_engine = RAGEngine()
+    rag_engine.vectorstore = fake_store
+    yield rag_engine
+    rag_engine.close()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from backend.core.dataset_builder import (
+    ChromaChunkSource,
+    DatasetBuildError,
+    DatasetBuilder,
+    QAPairIndex,
+    SnapshotChunkSource,
+    load_shards,
+)
+from backend.core.index_snapshot import write_snapshot
+
+WORDS = "politica ferias filial prazo dias reembolso contrato".split()
+
+
+@pytest.fixture(scope="module")
+def tokenizer_dir(tmp_path_factory) -> str:
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    directory = str(tmp_path_factory.mktemp("tokenizer"))
+    vocab = {token: idx for idx, token in enumerate(["<pad>", "</s>", "<unk>", *WORDS])}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, eos_token="</s>", pad_token="<pad>", unk_token="<unk>"
+    ).save_pretrained(directory)
+    return directory
+
+
+def _snapshot(tmp_path, count: int = 10) -> str:
+    path = str(tmp_path / "gen.ragsnap")
+    metadata = {"source": "rh.pdf"}
+    write_snapshot(
+        path,
+        (
+            (f"doc:{idx}", [float(idx)], f"Politica de ferias {idx}. Prazo de dias.", metadata)
+            for idx in range(count)
+        ),
+        dtype="float32",
+    )
+    return path
+
+
+class _InterruptedSource:
+    def __init__(self, source, pages: int) -> None:
+        self.source = source
+        self.pages = pages
+
+    def describe(self):
+        return self.source.describe()
+
+    def iter_pages(self, start, page_size):
+        for number, page in enumerate(self.source.iter_pages(start, page_size)):
+            if number == self.pages:
+                raise KeyboardInterrupt
+            yield page
+
+
+def test_build_resumes_from_last_shard_after_interruption(tmp_path, tokenizer_dir) -> None:
+    source = SnapshotChunkSource(_snapshot(tmp_path))
+    output = str(tmp_path / "dataset")
+
+    def builder() -> DatasetBuilder:
+        return DatasetBuilder(output, tokenizer_dir, shard_size=3, page_size=2, extractive=True)
+
+    with pytest.raises(KeyboardInterrupt):
+        builder().build(_InterruptedSource(source, pages=3))
+    with open(f"{output}/manifest.json", encoding="utf-8") as handle:
+        partial = json.load(handle)
+    # Duas paginas (4 chunks) formaram um shard; a terceira se perdeu com a interrupcao
+    assert partial["chunks_consumed"] == 4
+    assert len(partial["shards"]) == 1
+    assert partial["complete"] is False
+
+    manifest = builder().build(source)
+    source.close()
+
+    assert manifest["complete"] is True
+    assert manifest["chunks_consumed"] == 10
+    assert [shard["chunks"] for shard in manifest["shards"]] == [[0, 4], [4, 8], [8, 10]]
+    dataset = load_shards(output)
+    assert dataset["chunk_id"] == [f"doc:{idx}" for idx in range(10)]
+    assert dataset[0]["answer"] == "Politica de ferias 0. Prazo de dias."
+    assert dataset[0]["labels"][-1] == 1  # </s>
+    assert len(dataset[0]["input_ids"]) == len(dataset[0]["attention_mask"])
+
+
+def test_causal_examples_mask_prompt_and_use_qa_pairs(tmp_path, tokenizer_dir) -> None:
+    class _Collection:
+        def get(self, include, limit, offset):
+            rows = [("a:0", "Prazo de reembolso", {"source": "fin.pdf"}), ("b:0", "Contrato", None)]
+            rows = rows[offset : offset + limit]
+            return {
+                "ids": [row[0] for row in rows],
+                "documents": [row[1] for row in rows],
+                "metadatas": [row[2] for row in rows],
+            }
+
+    qa_file = tmp_path / "qa.jsonl"
+    qa_file.write_text(
+        json.dumps({"chunk_id": "a:0", "question": "Qual o prazo?", "answer": "prazo dias"}) + "\n",
+        encoding="utf-8",
+    )
+    output = str(tmp_path / "dataset")
+    DatasetBuilder(
+        output, tokenizer_dir, task="text-generation", qa_file=str(qa_file)
+    ).build(ChromaChunkSource(_Collection(), "chroma"))
+
+    [example] = load_shards(output)
+    assert example["question"] == "Qual o prazo?"
+    answer_length = 3  # "prazo dias" + </s>
+    assert example["labels"][:-answer_length] == [-100] * (
+        len(example["input_ids"]) - answer_length
+    )
+    assert example["labels"][-answer_length:] == example["input_ids"][-answer_length:]
+
+
+def test_build_rejects_output_from_other_configuration(tmp_path, tokenizer_dir) -> None:
+    source = SnapshotChunkSource(_snapshot(tmp_path, count=2))
+    output = str(tmp_path / "dataset")
+    DatasetBuilder(output, tokenizer_dir, extractive=True).build(source)
+
+    with pytest.raises(DatasetBuildError):
+        DatasetBuilder(output, tokenizer_dir, max_source_length=64, extractive=True).build(source)
+    source.close()
+
+
+def test_build_requires_qa_pairs_unless_extractive_is_explicit(
+    tmp_path, tokenizer_dir, caplog
+) -> None:
+    source = SnapshotChunkSource(_snapshot(tmp_path, count=2))
+    with pytest.raises(DatasetBuildError):
+        DatasetBuilder(str(tmp_path / "dataset"), tokenizer_dir).build(source)
+
+    qa_file = tmp_path / "qa.jsonl"
+    qa_file.write_text(
+        json.dumps({"chunk_id": "doc:1", "question": "Qual o prazo?", "answer": "dias"}) + "\n",
+        encoding="utf-8",
+    )
+    DatasetBuilder(str(tmp_path / "qa"), tokenizer_dir, qa_file=str(qa_file)).build(source)
+    DatasetBuilder(
+        str(tmp_path / "mixed"), tokenizer_dir, qa_file=str(qa_file), extractive=True
+    ).build(source)
+    source.close()
+
+    assert load_shards(str(tmp_path / "qa"))["chunk_id"] == ["doc:1"]
+    mixed = load_shards(str(tmp_path / "mixed"))
+    assert mixed["question"] == [
+        "Qual e o ponto principal do trecho do documento rh.pdf?",
+        "Qual o prazo?",
+    ]
+    assert "extrativos" in caplog.text
+
+
+def test_parallel_tokenization_matches_in_process(tmp_path, tokenizer_dir) -> None:
+    source = SnapshotChunkSource(_snapshot(tmp_path, count=6))
+    for name, workers in (("serial", 0), ("parallel", 2)):
+        DatasetBuilder(
+            str(tmp_path / name),
+            tokenizer_dir,
+            shard_size=4,
+            page_size=1,
+            workers=workers,
+            extractive=True,
+        ).build(source)
+    source.close()
+
+    assert load_shards(str(tmp_path / "parallel")).to_dict() == load_shards(
+        str(tmp_path / "serial")
+    ).to_dict()
+
+
+def test_qa_pairs_are_looked_up_per_page_from_an_index(tmp_path) -> None:
+    qa_file = tmp_path / "qa.jsonl"
+    rows = [("doc:1", "p1", "r1"), ("doc:0", "p0", "r0"), ("doc:1", "p2", "r2")]
+    qa_file.write_text(
+        "\n".join(
+            json.dumps({"chunk_id": chunk_id, "question": question, "answer": answer})
+            for chunk_id, question, answer in rows
+        )
+    )
+    path = str(tmp_path / "qa_pairs.sqlite3")
+
+    index = QAPairIndex.build(str(qa_file), path)
+    try:
+        assert index.lookup(["doc:1", "doc:9"]) == {"doc:1": [("p1", "r1"), ("p2", "r2")]}
+    finally:
+        index.close()
+    built_at = (tmp_path / "qa_pairs.sqlite3").stat().st_mtime_ns
+
+    QAPairIndex.build(str(qa_file), path).close()
+    assert (tmp_path / "qa_pairs.sqlite3").stat().st_mtime_ns == built_at
+
+    qa_file.write_text(qa_file.read_text() + "\n{\"chunk_id\": \"doc:2\"}\n")
+    with pytest.raises(DatasetBuildError, match="qa.jsonl:4: par invalido"):
+        QAPairIndex.build(str(qa_file), path)
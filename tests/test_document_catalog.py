@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from backend.core.document_catalog import DocumentCatalog
+
+
+def test_catalog_lists_only_committed_documents(tmp_path) -> None:
+    catalog = DocumentCatalog(str(tmp_path / "catalog.sqlite3"))
+
+    catalog.begin("doc1", "a.pdf", ["doc1:0", "doc1:1"], size_bytes=10, page_count=2)
+    assert catalog.list_documents() == []
+    assert catalog.get("doc1") is None
+
+    catalog.commit("doc1")
+
+    [listed] = catalog.list_documents()
+    assert listed["doc_id"] == "doc1"
+    assert listed["chunk_count"] == 2
+    assert listed["page_count"] == 2
+    assert listed["indexed_at"] is not None
+    assert catalog.get("doc1")["chunk_ids"] == ["doc1:0", "doc1:1"]
+
+
+def test_catalog_reports_incomplete_writes(tmp_path) -> None:
+    catalog = DocumentCatalog(str(tmp_path / "catalog.sqlite3"))
+    catalog.begin("pending", "p.txt", ["pending:0"])
+    catalog.begin("deleting", "d.txt", ["deleting:0", "deleting:1"])
+    catalog.commit("deleting")
+    catalog.mark_deleting("deleting")
+
+    assert sorted(catalog.incomplete()) == [
+        ("deleting", ["deleting:0", "deleting:1"]),
+        ("pending", ["pending:0"]),
+    ]
+
+
+def test_engine_indexes_and_deletes_by_explicit_ids(engine) -> None:
+    chunks = [
+        {"text": "primeiro", "source": "a.txt", "doc_id": "doc1", "size_bytes": 16},
+        {"text": "segundo", "source": "a.txt", "doc_id": "doc1", "size_bytes": 16},
+    ]
+
+    engine.index_documents(chunks)
+
+    assert set(engine.vectorstore.vectors) == {"doc1:0", "doc1:1"}
+    assert engine.get_document("doc1")["size_bytes"] == 16
+
+    assert engine.delete_document("doc1") is True
+    assert engine.vectorstore.vectors == {}
+    assert engine.vectorstore.deleted_batches[-1] == ["doc1:0", "doc1:1"]
+    assert engine.list_documents() == []
+    assert engine.delete_document("doc1") is False
+
+
+def test_engine_recovers_interrupted_write(engine) -> None:
+    engine.vectorstore.add_texts(["orfao"], ids=["doc2:0"])
+    engine.catalog.begin("doc2", "b.txt", ["doc2:0"])
+
+    engine._recover_catalog()
+
+    assert engine.vectorstore.vectors == {}
+    assert engine.catalog.incomplete() == []
+
+
+def test_legacy_vectors_are_backfilled_once_and_never_scanned_on_upload(engine) -> None:
+    store = engine.vectorstore
+    store.upsert(
+        ["uuid-b", "uuid-a"],
+        [[0.0], [0.0]],
+        ["segundo", "primeiro"],
+        [
+            {"source": "old.pdf", "chunk_id": 1, "doc_id": "old"},
+            {"source": "old.pdf", "chunk_id": 0, "doc_id": "old"},
+        ],
+    )
+
+    assert engine._backfill_legacy_vectors() == 1
+    assert engine.get_document("old")["chunk_ids"] == ["uuid-a", "uuid-b"]
+    assert engine._backfill_legacy_vectors() == 0
+
+    filtered = []
+    original_delete = store.delete
+
+    def delete(ids=None, where=None):
+        if where is not None:
+            filtered.append(where)
+        original_delete(ids=ids, where=where)
+
+    store.delete = delete
+    engine.index_documents([{"text": "novo", "source": "new.pdf", "doc_id": "new"}])
+    engine.index_documents([{"text": "atualizado", "source": "old.pdf", "doc_id": "old"}])
+
+    assert filtered == []
+    assert set(store.vectors) == {"new:0", "old:0"}
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from typing import List
+
+from backend.core.embedding_scheduler import LengthBucketedEmbeddings, plan_batches
+from backend.core.rag_engine import _DeterministicFallbackEmbeddings
+
+
+class _RecordingEmbeddings:
+    def __init__(self) -> None:
+        self.batches: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.batches.append(list(texts))
+        return [[float(len(text.split()))] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [0.0]
+
+
+def test_batches_respect_padded_token_budget() -> None:
+    lengths = [40, 5, 5, 40, 5, 100, 5]
+
+    batches = plan_batches(lengths, token_budget=80, max_batch_size=3)
+
+    assert batches == [[1, 2, 4], [6, 0], [3], [5]]
+    for batch in batches[:-1]:
+        assert len(batch) * max(lengths[index] for index in batch) <= 80
+
+
+def test_embeddings_are_returned_in_original_order() -> None:
+    base = _RecordingEmbeddings()
+    texts = ["um " * 30, "dois", "tres " * 3, "quatro " * 30, "cinco"]
+    embeddings = LengthBucketedEmbeddings(base, token_budget=40, max_batch_size=8)
+
+    vectors = embeddings.embed_documents(texts)
+
+    assert vectors == [[30.0], [1.0], [3.0], [30.0], [1.0]]
+    # Textos curtos juntos; cada texto longo sozinho por causa do orcamento
+    assert [len(batch) for batch in base.batches] == [3, 1, 1]
+
+
+def test_token_lengths_use_model_tokenizer_truncated_to_max_length() -> None:
+    class _Client:
+        max_seq_length = 4
+
+        @staticmethod
+        def tokenizer(texts, add_special_tokens, truncation, max_length):
+            ids = [[0] + list(text) + [2] for text in texts]
+            return {"input_ids": [row[:max_length] if truncation else row for row in ids]}
+
+    base = _RecordingEmbeddings()
+    base.client = _Client()
+
+    assert LengthBucketedEmbeddings(base).token_lengths(["a", "abcdef"]) == [3, 4]
+
+
+def test_process_pool_matches_in_process_embeddings() -> None:
+    base = _DeterministicFallbackEmbeddings()
+    texts = [f"chunk {'palavra ' * idx}" for idx in range(12)]
+    embeddings = LengthBucketedEmbeddings(
+        base,
+        token_budget=16,
+        workers=2,
+        worker_factory=_DeterministicFallbackEmbeddings,
+    )
+    try:
+        vectors = embeddings.embed_documents(texts)
+    finally:
+        embeddings.close()
+
+    assert vectors == [base._embed_text(text) for text in texts]
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from backend.core.index_snapshot import (
+    IndexSnapshot,
+    SnapshotError,
+    chain_state,
+    open_chain,
+    write_snapshot,
+)
+
+
+def _records(count: int, start: int = 0, dim: int = 8):
+    for idx in range(start, start + count):
+        yield (
+            f"doc:{idx}",
+            [float(idx)] * dim,
+            f"chunk {idx} com acentuação",
+            {"source": "doc.pdf", "doc_id": "doc", "chunk_id": idx},
+        )
+
+
+def test_snapshot_round_trip_is_memory_mapped(tmp_path) -> None:
+    path = str(tmp_path / "full.ragsnap")
+    header = write_snapshot(
+        path, _records(3), dtype="float16", catalog={"documents": [], "fingerprints": []}
+    )
+
+    with IndexSnapshot(path) as snapshot:
+        assert snapshot.checksum == header["checksum"]
+        assert snapshot.kind == "full"
+        assert (snapshot.count, snapshot.dim) == (3, 8)
+        assert snapshot.vectors.dtype == np.float16
+        assert snapshot.vectors.flags["OWNDATA"] is False
+        assert snapshot.vectors.ctypes.data % 64 == 0
+        assert np.allclose(snapshot.vectors[2], 2.0)
+        assert snapshot.record(1) == {
+            "id": "doc:1",
+            "text": "chunk 1 com acentuação",
+            "metadata": {"source": "doc.pdf", "doc_id": "doc", "chunk_id": 1},
+        }
+        assert snapshot.catalog() == {"documents": [], "fingerprints": []}
+
+
+def test_snapshot_detects_corruption(tmp_path) -> None:
+    path = tmp_path / "full.ragsnap"
+    write_snapshot(str(path), _records(2), dtype="float32")
+
+    data = bytearray(path.read_bytes())
+    data[70] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError):
+        IndexSnapshot(str(path))
+
+
+def test_delta_chain_must_follow_parent(tmp_path) -> None:
+    full = str(tmp_path / "0-full.ragsnap")
+    delta = str(tmp_path / "1-delta.ragsnap")
+    header = write_snapshot(full, _records(3), catalog={"documents": [{"doc_id": "doc"}]})
+    write_snapshot(
+        delta,
+        _records(1, start=3),
+        kind="delta",
+        parent=header["checksum"],
+        deleted_ids=["doc:0"],
+    )
+
+    chain = open_chain([full, delta])
+    try:
+        ids, documents = chain_state(chain)
+    finally:
+        for snapshot in chain:
+            snapshot.close()
+    assert ids == {"doc:1", "doc:2", "doc:3"}
+    assert documents == {"doc": None}
+
+    with pytest.raises(SnapshotError):
+        open_chain([delta])
+
+    with pytest.raises(SnapshotError):
+        write_snapshot(str(tmp_path / "orphan.ragsnap"), _records(1), kind="delta")
+
+
+def _upload(engine, doc_id: str, *texts: str) -> None:
+    engine.index_documents(
+        [{"text": text, "source": f"{doc_id}.pdf", "doc_id": doc_id} for text in texts]
+    )
+
+
+def test_full_import_replaces_existing_index(engine, tmp_path) -> None:
+    _upload(engine, "x", "Politica de ferias da filial de Campinas.")
+    path = str(tmp_path / "full.ragsnap")
+    engine.export_snapshot(path)
+    engine.delete_document("x")
+    _upload(engine, "y", "Manual de reembolso de despesas de viagem.")
+
+    engine.import_snapshot([path])
+
+    assert set(engine.vectorstore.vectors) == {"x:0"}
+    assert [doc["doc_id"] for doc in engine.list_documents()] == ["x"]
+    assert engine.catalog.pending_purges() == []
+
+
+def test_import_waits_for_the_batch_being_written(engine, tmp_path) -> None:
+    _upload(engine, "x", "Politica de ferias da filial de Campinas.")
+    path = str(tmp_path / "full.ragsnap")
+    engine.export_snapshot(path)
+    embedding, release = threading.Event(), threading.Event()
+    embed_documents = engine.embeddings.embed_documents
+
+    def slow_embed(texts):
+        embedding.set()
+        release.wait(timeout=5)
+        return embed_documents(texts)
+
+    engine.embeddings.embed_documents = slow_embed
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        upload = pool.submit(_upload, engine, "b", "Manual de reembolso de despesas.")
+        assert embedding.wait(timeout=5)
+        restore = pool.submit(engine.import_snapshot, [path])
+        release.set()
+        upload.result(timeout=5)
+        restore.result(timeout=5)
+
+    # O lote de "b" termina antes da importacao, que substitui o indice inteiro
+    assert set(engine.vectorstore.vectors) == {"x:0"}
+    assert [doc["doc_id"] for doc in engine.list_documents()] == ["x"]
+    assert engine.catalog.incomplete() == []
+
+
+def test_delta_carries_metadata_of_reassigned_vectors(engine, tmp_path, monkeypatch) -> None:
+    disclaimer = "Documento confidencial de uso exclusivamente interno da empresa."
+    _upload(engine, "a", "Politica de ferias da filial de Campinas.", disclaimer)
+    _upload(engine, "b", disclaimer, "Manual de reembolso de despesas de viagem.")
+    full = str(tmp_path / "full.ragsnap")
+    delta = str(tmp_path / "delta.ragsnap")
+    engine.export_snapshot(full)
+    engine.delete_document("a")
+
+    header = engine.export_snapshot(delta, base_paths=[full])
+
+    assert header["deleted_ids"] == ["a:0"]
+    with IndexSnapshot(delta) as snapshot:
+        assert list(snapshot.ids()) == ["a:1"]
+        assert snapshot.catalog()["deleted_documents"] == ["a"]
+
+    from backend.core.rag_engine import RAGEngine
+    from tests.conftest import FakeVectorStore
+
+    monkeypatch.setenv("RAG_DATA_DIR", str(tmp_path / "replica"))
+    replica = RAGEngine()
+    replica.vectorstore = FakeVectorStore()
+    try:
+        replica.import_snapshot([full, delta])
+        assert set(replica.vectorstore.vectors) == {"a:1", "b:1"}
+        assert replica.vectorstore.metadata("a:1") == {
+            "source": "b.pdf",
+            "chunk_id": 0,
+            "doc_id": "b",
+        }
+        assert [doc["doc_id"] for doc in replica.list_documents()] == ["b"]
+    finally:
+        replica.close()
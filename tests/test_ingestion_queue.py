@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from backend.core.ingestion_queue import IngestionQueue
+
+
+def test_queue_groups_pending_operations_into_one_batch() -> None:
+    release = threading.Event()
+    batches = []
+
+    def apply_batch(operations):
+        batches.append(operations)
+        release.wait(timeout=5)
+        return [operation["doc_id"] for operation in operations]
+
+    ingestion = IngestionQueue(apply_batch, max_delay=0)
+    ingestion.start()
+    try:
+        first = ingestion.submit({"op": "delete", "doc_id": "a"})
+        while not batches:
+            pass
+        # Enquanto o primeiro lote e aplicado, os demais se acumulam na fila
+        others = [ingestion.submit({"op": "delete", "doc_id": name}) for name in "bcd"]
+        release.set()
+        assert first.result(timeout=5) == "a"
+        assert [future.result(timeout=5) for future in others] == ["b", "c", "d"]
+    finally:
+        ingestion.close()
+
+    assert [len(batch) for batch in batches] == [1, 3]
+
+
+def test_failed_batch_is_rolled_back_and_retried_one_operation_at_a_time() -> None:
+    release = threading.Event()
+    batches = []
+    rollbacks = []
+
+    def apply_batch(operations):
+        batches.append([operation["doc_id"] for operation in operations])
+        release.wait(timeout=5)
+        if any(operation["doc_id"] == "bad" for operation in operations):
+            raise RuntimeError("falha simulada")
+        return [operation["doc_id"] for operation in operations]
+
+    ingestion = IngestionQueue(
+        apply_batch, max_delay=0, rollback=lambda: rollbacks.append(len(batches))
+    )
+    ingestion.start()
+    try:
+        first = ingestion.submit({"op": "delete", "doc_id": "a"})
+        while not batches:
+            pass
+        others = [ingestion.submit({"op": "delete", "doc_id": name}) for name in ("b", "bad", "c")]
+        release.set()
+        assert first.result(timeout=5) == "a"
+        assert others[0].result(timeout=5) == "b"
+        with pytest.raises(RuntimeError):
+            others[1].result(timeout=5)
+        assert others[2].result(timeout=5) == "c"
+    finally:
+        ingestion.close()
+
+    assert batches == [["a"], ["b", "bad", "c"], ["b"], ["bad"], ["c"]]
+    # Desfeito antes de reaplicar o grupo e depois da operacao defeituosa
+    assert rollbacks == [2, 4]
+
+
+@pytest.fixture(autouse=True)
+def _slow_batches(monkeypatch) -> None:
+    # Janela maior para que os uploads concorrentes caiam no mesmo lote
+    monkeypatch.setenv("RAG_INGEST_MAX_DELAY_MS", "200")
+
+
+def _chunks(doc_id: str):
+    return [{"text": f"Conteudo exclusivo do documento {doc_id}", "source": f"{doc_id}.txt", "doc_id": doc_id}]
+
+
+def test_concurrent_uploads_share_one_vectorstore_write(engine) -> None:
+    doc_ids = [f"doc{idx}" for idx in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        reports = list(pool.map(lambda doc_id: engine.index_documents(_chunks(doc_id)), doc_ids))
+
+    assert all(report["chunks_embedded"] == 1 for report in reports)
+    assert engine.vectorstore.upserts < len(doc_ids)
+    assert {doc["doc_id"] for doc in engine.list_documents()} == set(doc_ids)
+
+
+def test_batch_coalesces_operations_on_the_same_document(engine) -> None:
+    results = engine._apply_batch(
+        [
+            {"op": "index", "chunks": _chunks("a")},
+            {"op": "delete", "doc_id": "a"},
+            {"op": "delete", "doc_id": "missing"},
+        ]
+    )
+
+    assert results[1:] == [True, False]
+    assert engine.vectorstore.upserts == 0
+    assert engine.list_documents() == []
+
+
+def test_reupload_does_not_overwrite_vectors_shared_with_other_documents(engine) -> None:
+    notice = {"text": "Aviso legal comum a todos.", "source": "x.txt", "doc_id": "x"}
+    engine.index_documents([notice])
+    engine.index_documents([dict(notice, source="y.txt", doc_id="y")])
+    engine.index_documents([{"text": "Nova versao de x.", "source": "x.txt", "doc_id": "x"}])
+
+    [shared] = engine.get_document("y")["chunk_ids"]
+    [own] = engine.get_document("x")["chunk_ids"]
+    assert shared == "x:0" and own != shared
+    assert engine.vectorstore.vectors == {shared: notice["text"], own: "Nova versao de x."}
+    assert engine.vectorstore.metadata(shared)["doc_id"] == "y"
+
+
+def test_failed_reupload_keeps_the_previous_version(engine) -> None:
+    engine.index_documents(_chunks("x"))
+    previous, listed = engine.get_document("x"), engine.list_documents()
+    embed_documents = engine.embeddings.embed_documents
+    seen_while_embedding = []
+
+    def failing(texts):
+        if any("nova versao" in text for text in texts):
+            # A versao anterior segue visivel enquanto o reupload e embedado
+            seen_while_embedding.append(
+                (engine.get_document("x"), engine.list_documents(), engine.catalog.pending_purges())
+            )
+            raise RuntimeError("modelo indisponivel")
+        return embed_documents(texts)
+
+    engine.embeddings.embed_documents = failing
+    with pytest.raises(RuntimeError):
+        engine.index_documents(
+            [{"text": "Conteudo da nova versao de x", "source": "x.txt", "doc_id": "x"}]
+        )
+    engine.index_documents(_chunks("y"))
+
+    assert seen_while_embedding == [(previous, listed, [])]
+    assert engine.vectorstore.vectors == {
+        "x:0": "Conteudo exclusivo do documento x",
+        "y:0": "Conteudo exclusivo do documento y",
+    }
+    assert [doc["doc_id"] for doc in engine.list_documents()] == ["x", "y"]
+    assert engine.catalog.incomplete() == []
+    assert engine.catalog.pending_purges() == []
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from backend.core.document_catalog import DocumentCatalog
+from backend.core.near_duplicates import MinHasher
+
+
+DISCLAIMER = (
+    "Este documento e confidencial e destinado exclusivamente ao uso interno da empresa. "
+    "A reproducao total ou parcial sem autorizacao previa e proibida."
+)
+
+
+def test_near_duplicate_texts_share_lsh_buckets() -> None:
+    hasher = MinHasher()
+    original = hasher.signature(DISCLAIMER)
+    variant = hasher.signature(DISCLAIMER.upper() + "  ")
+    unrelated = hasher.signature("Relatorio trimestral de vendas da filial de Campinas.")
+
+    assert hasher.similarity(original, variant) == 1.0
+    assert set(hasher.band_keys(original)) & set(hasher.band_keys(variant))
+    assert hasher.similarity(original, unrelated) < 0.5
+    assert hasher.unpack(hasher.pack(original)) == original
+
+
+def test_catalog_keeps_shared_vectors_until_last_reference(tmp_path) -> None:
+    hasher = MinHasher()
+    catalog = DocumentCatalog(str(tmp_path / "catalog.sqlite3"))
+    signature = hasher.signature(DISCLAIMER)
+    keys = hasher.band_keys(signature)
+
+    catalog.begin(
+        "doc1", "a.pdf", ["doc1:0", "doc1:1"], fingerprints=[("doc1:0", hasher.pack(signature), keys)]
+    )
+    catalog.commit("doc1")
+    catalog.begin("doc2", "b.pdf", ["doc1:0", "doc2:1"])
+    catalog.commit("doc2")
+
+    candidates = catalog.find_candidates(keys)
+    assert {vector_id for entries in candidates.values() for vector_id, _ in entries} == {"doc1:0"}
+
+    orphans, shared = catalog.release_plan("doc1")
+    assert orphans == ["doc1:1"]
+    assert shared == {"doc1:0": {"doc_id": "doc2", "position": 0, "source": "b.pdf"}}
+
+    catalog.remove("doc1", released_vector_ids=orphans)
+    assert catalog.find_candidates(keys)
+
+    orphans, shared = catalog.release_plan("doc2")
+    assert orphans == ["doc1:0", "doc2:1"]
+    assert shared == {}
+    catalog.remove("doc2", released_vector_ids=orphans)
+    assert catalog.find_candidates(keys) == {}
+
+
+def test_engine_embeds_boilerplate_once(engine) -> None:
+    first = engine.index_documents(
+        [
+            {"text": "Politica de ferias da equipe comercial.", "source": "a.pdf", "doc_id": "a"},
+            {"text": DISCLAIMER, "source": "a.pdf", "doc_id": "a"},
+        ]
+    )
+    second = engine.index_documents(
+        [
+            {"text": DISCLAIMER, "source": "b.pdf", "doc_id": "b"},
+            {"text": "Manual de reembolso de despesas.", "source": "b.pdf", "doc_id": "b"},
+        ]
+    )
+
+    assert first["near_duplicates"] == 0
+    assert second == {
+        "chunks_total": 2,
+        "chunks_embedded": 1,
+        "near_duplicates": 1,
+        "chars_saved": len(DISCLAIMER),
+    }
+    assert set(engine.vectorstore.vectors) == {"a:0", "a:1", "b:1"}
+    assert engine.get_document("b")["chunk_ids"] == ["a:1", "b:1"]
+
+    engine.delete_document("a")
+
+    assert set(engine.vectorstore.vectors) == {"a:1", "b:1"}
+
+
+def _return_policy(days: int) -> str:
+    return (
+        "Politica de trocas e devolucoes da loja. O cliente pode solicitar a troca ou a "
+        "devolucao de qualquer produto comprado em nossas lojas fisicas ou no site oficial, "
+        "desde que o item esteja sem sinais de uso, com etiquetas e na embalagem original. "
+        f"O prazo para a solicitacao e de {days} dias corridos a partir da data de entrega. "
+        "Apos a analise do produto pela equipe de qualidade, o reembolso sera feito na mesma "
+        "forma de pagamento utilizada na compra, em ate dez dias uteis, ou convertido em "
+        "credito para novas compras, conforme a preferencia informada pelo cliente no "
+        "momento do atendimento. Produtos personalizados e itens de higiene pessoal nao "
+        "podem ser trocados, exceto em caso de defeito de fabricacao comprovado."
+    )
+
+
+def _count_embedded(engine) -> list:
+    embedded: list = []
+    embed_documents = engine.embeddings.embed_documents
+
+    def counting(texts):
+        embedded.extend(texts)
+        return embed_documents(texts)
+
+    engine.embeddings.embed_documents = counting
+    return embedded
+
+
+def test_near_duplicate_keeps_its_own_text_and_reuses_the_embedding(engine) -> None:
+    hasher = engine.minhasher
+    assert hasher.similarity(
+        hasher.signature(_return_policy(30)), hasher.signature(_return_policy(15))
+    ) >= engine.near_dedup_threshold
+
+    engine.index_documents([{"text": _return_policy(30), "source": "a.pdf", "doc_id": "a"}])
+    embedded = _count_embedded(engine)
+    report = engine.index_documents(
+        [{"text": _return_policy(15), "source": "b.pdf", "doc_id": "b"}]
+    )
+
+    store = engine.vectorstore
+    assert embedded == []
+    assert report["chunks_embedded"] == 0 and report["near_duplicates"] == 1
+    assert engine.get_document("b")["chunk_ids"] == ["b:0"]
+    assert "15 dias" in store.vectors["b:0"] and "30 dias" in store.vectors["a:0"]
+    assert store.metadata("b:0") == {"source": "b.pdf", "chunk_id": 0, "doc_id": "b"}
+    assert store.records["b:0"][0] == store.records["a:0"][0]
+
+    engine.delete_document("a")
+
+    assert set(store.vectors) == {"b:0"}
+
+
+def test_near_duplicates_keep_their_text_however_many_documents_repeat_them(engine) -> None:
+    for doc_id, days in (("a", 30), ("b", 15)):
+        engine.index_documents(
+            [{"text": _return_policy(days), "source": f"{doc_id}.pdf", "doc_id": doc_id}]
+        )
+    report = engine.index_documents(
+        [{"text": _return_policy(45), "source": "c.pdf", "doc_id": "c"}]
+    )
+    engine.index_documents([{"text": _return_policy(45), "source": "d.pdf", "doc_id": "d"}])
+
+    store = engine.vectorstore
+    assert report["near_duplicates"] == 1 and report["chunks_embedded"] == 0
+    assert engine.get_document("c")["chunk_ids"] == ["c:0"]
+    assert "45 dias" in store.vectors["c:0"]
+    # Apenas o texto identico compartilha o vetor
+    assert engine.get_document("d")["chunk_ids"] == ["c:0"]
+    assert set(store.vectors) == {"a:0", "b:0", "c:0"}
+
+
+def test_vectors_indexed_before_digests_are_still_matched_by_identical_text(engine) -> None:
+    engine.index_documents([{"text": _return_policy(30), "source": "a.pdf", "doc_id": "a"}])
+    with engine.catalog._connect() as conn:  # catalogado sem digest, como antes
+        conn.execute("DELETE FROM text_digests")
+
+    assert engine._backfill_text_digests() == 1
+    engine.index_documents([{"text": _return_policy(30), "source": "b.pdf", "doc_id": "b"}])
+
+    assert engine.get_document("b")["chunk_ids"] == ["a:0"]
+    assert set(engine.vectorstore.vectors) == {"a:0"}
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from langchain.docstore.document import Document
+
+from backend import main
+from backend.core.rag_engine import RAGEngine
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+def test_build_sources_respects_source_chars() -> None:
+    documents = [Document(page_content="abcdefghij", metadata={"source": "a.txt"})]
+
+    assert RAGEngine._build_sources(documents, 4) == [{"text": "abcd...", "source": "a.txt"}]
+    assert RAGEngine._build_sources(documents, 0) == [{"source": "a.txt"}]
+
+
+async def test_query_forwards_source_options_and_compresses(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls = []
+
+    def fake_query(question, top_k=5, include_sources=True, source_chars=200):
+        calls.append((question, top_k, include_sources, source_chars))
+        sources = [{"text": "ç" * source_chars + "...", "source": "doc.txt"}] * 20
+        return {"answer": "Informação", "sources": sources if include_sources else []}
+
+    monkeypatch.setattr(main.rag_engine, "query", fake_query)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app),
+        base_url="http://testserver",
+    ) as client:
+        small = await client.post(
+            "/api/v1/query",
+            json={"question": "pergunta", "include_sources": False},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        large = await client.post(
+            "/api/v1/query",
+            json={"question": "pergunta", "top_k": 3, "source_chars": 100},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        invalid = await client.post(
+            "/api/v1/query", json={"question": "pergunta", "source_chars": -1}
+        )
+
+    assert calls == [("pergunta", 5, False, 200), ("pergunta", 3, True, 100)]
+
+    assert small.headers["content-type"] == "application/json; charset=utf-8"
+    assert "content-encoding" not in small.headers
+    assert small.json() == {"answer": "Informação", "sources": []}
+
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.headers["content-type"] == "application/json; charset=utf-8"
+    assert len(large.json()["sources"]) == 20
+
+    assert invalid.status_code == 422
+
+
+async def test_query_waiting_for_a_write_does_not_block_the_event_loop(monkeypatch) -> None:
+    release = threading.Event()
+
+    def blocked_query(question, top_k=5, include_sources=True, source_chars=200):
+        release.wait(timeout=2)  # como uma consulta esperando o lock de escrita
+        return {"answer": "ok", "sources": []}
+
+    monkeypatch.setattr(main.rag_engine, "query", blocked_query)
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app),
+        base_url="http://testserver",
+    ) as client:
+        started = time.monotonic()
+        query = asyncio.ensure_future(client.post("/api/v1/query", json={"question": "p"}))
+        await asyncio.sleep(0.05)  # a consulta comeca e fica bloqueada
+        health = await client.get("/api/v1/health")
+        elapsed = time.monotonic() - started
+        release.set()
+        answered = await query
+
+    assert health.status_code == 200 and elapsed < 1
+    assert answered.json() == {"answer": "ok", "sources": []}
+
+
+async def test_snapshot_downloads_are_not_gzipped(monkeypatch, tmp_path) -> None:
+    snapshot = tmp_path / "base.ragsnap"
+    snapshot.write_bytes(b"\0" * 4096)
+    monkeypatch.setattr(main.rag_engine, "snapshot_path", lambda name: str(snapshot))
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=main.app),
+        base_url="http://testserver",
+    ) as client:
+        response = await client.get(
+            "/api/v1/snapshots/base.ragsnap", headers={"Accept-Encoding": "gzip"}
+        )
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-length"] == "4096"
@@ -79,3 +79,17 @@ def test_query_deduplicates_documents_and_sources() -> None:
 
     unique_pairs = {(source["source"], source["text"]) for source in response["sources"]}
     assert len(unique_pairs) == len(response["sources"])
+
+
+def test_close_shuts_down_the_embedding_workers(engine) -> None:
+    closed = []
+
+    class _PooledEmbeddings:
+        def close(self) -> None:
+            closed.append(True)
+
+    engine.close()  # fallback deterministico: sem close(), nada a encerrar
+    engine.embeddings = _PooledEmbeddings()
+    engine.close()
+
+    assert closed == [True]
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import time
+from typing import List
+
+import numpy as np
+import pytest
+
+from backend.core.index_snapshot import IndexSnapshot, write_snapshot
+from backend.core.shared_index import (
+    GenerationPublisher,
+    SharedIndex,
+    read_current_chain,
+    read_current_generation,
+)
+from backend.core.vector_index import IVFIndex, index_paths
+
+
+class _AxisEmbeddings:
+    """Embeddings 2D triviais: 'norte' aponta para y, o resto para x."""
+
+    def embed_query(self, text: str) -> List[float]:
+        return [0.0, 1.0] if "norte" in text else [1.0, 0.0]
+
+
+def _export(records):
+    def export(path: str):
+        return write_snapshot(path, records, dtype="float32")
+
+    return export
+
+
+def test_workers_hot_swap_to_newest_generation(tmp_path) -> None:
+    publisher = GenerationPublisher(str(tmp_path), keep=2)
+    index = SharedIndex(str(tmp_path), _AxisEmbeddings(), refresh_interval=0)
+
+    assert index.generation is None
+    assert index.similarity_search("qualquer coisa") == []
+
+    first = publisher.publish(
+        _export([("a:0", [1.0, 0.0], "filial leste", {"source": "a.txt"})])
+    )
+    assert read_current_generation(str(tmp_path)) == first
+
+    [document] = index.similarity_search("norte")
+    assert index.generation == first
+    assert document.page_content == "filial leste"
+
+    publisher.publish(
+        _export(
+            [
+                ("a:0", [1.0, 0.0], "filial leste", {"source": "a.txt"}),
+                ("b:0", [0.0, 1.0], "filial norte", {"source": "b.txt"}),
+            ]
+        )
+    )
+    results = index.similarity_search("norte", k=2)
+    assert [doc.page_content for doc in results] == ["filial norte", "filial leste"]
+    assert results[0].metadata == {"source": "b.txt"}
+
+
+def test_publisher_prunes_old_generations(tmp_path) -> None:
+    publisher = GenerationPublisher(str(tmp_path), keep=2)
+    names = [
+        publisher.publish(_export([(f"doc:{idx}", [float(idx), 0.0], "texto", {})]))
+        for idx in range(4)
+    ]
+
+    remaining = sorted(path.name for path in tmp_path.glob("gen-*"))
+    assert remaining == names[-2:]
+    assert read_current_generation(str(tmp_path)) == names[-1]
+
+
+def _delta(records, deleted_ids=()):
+    def export(path: str, base_paths):
+        with IndexSnapshot(base_paths[-1]) as parent:
+            checksum = parent.checksum
+        return write_snapshot(
+            path, records, dtype="float32", kind="delta", parent=checksum, deleted_ids=deleted_ids
+        )
+
+    return export
+
+
+def test_workers_merge_deltas_over_the_loaded_base(tmp_path) -> None:
+    publisher = GenerationPublisher(str(tmp_path))
+    publisher.publish(
+        _export(
+            [
+                ("a:0", [1.0, 0.0], "filial leste", {"source": "a.txt"}),
+                ("b:0", [0.0, 1.0], "filial norte", {"source": "b.txt"}),
+            ]
+        )
+    )
+    index = SharedIndex(str(tmp_path), _AxisEmbeddings(), refresh_interval=0)
+    base = index._state.base
+
+    publisher.publish_delta(
+        _delta(
+            [
+                ("a:0", [1.0, 0.0], "filial leste", {"source": "c.txt"}),
+                ("c:0", [0.1, 0.9], "filial norte nova", {"source": "c.txt"}),
+            ],
+            deleted_ids=["b:0"],
+        )
+    )
+    results = index.similarity_search("norte", k=3)
+
+    assert len(read_current_chain(str(tmp_path))) == 2
+    assert index._state.base is base
+    assert [doc.page_content for doc in results] == ["filial norte nova", "filial leste"]
+    assert results[1].metadata == {"source": "c.txt"}
+
+
+def test_publisher_prunes_whole_chains(tmp_path) -> None:
+    publisher = GenerationPublisher(str(tmp_path), keep=1)
+    publisher.publish(_export([("a:0", [1.0, 0.0], "texto", {})]))
+    publisher.publish_delta(_delta([("b:0", [0.0, 1.0], "texto", {})]))
+    latest = publisher.publish(_export([("a:0", [1.0, 0.0], "texto", {})]))
+
+    assert sorted(path.name for path in tmp_path.glob("gen-*")) == [latest]
+    assert read_current_chain(str(tmp_path)) == [latest]
+
+
+class _TableEmbeddings:
+    def __init__(self, vectors) -> None:
+        self.vectors = vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[int(text)].tolist()
+
+
+def _clustered(count: int, dim: int = 16, clusters: int = 20) -> np.ndarray:
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(clusters, dim)) * 4
+    return (centers[rng.integers(clusters, size=count)] + rng.normal(size=(count, dim))).astype(
+        np.float32
+    )
+
+
+def test_workers_search_the_mmapped_ivf_index(tmp_path) -> None:
+    vectors = _clustered(2000)
+    records = [(f"v:{idx}", vector, f"texto {idx}", {}) for idx, vector in enumerate(vectors)]
+    publisher = GenerationPublisher(str(tmp_path), keep=1)
+
+    def export_with_index(path: str):
+        header = write_snapshot(path, records, dtype="float32")
+        with IndexSnapshot(path) as snapshot:
+            IVFIndex.build(snapshot.vectors).save(path)
+        return header
+
+    first = publisher.publish(export_with_index)
+    exact = SharedIndex(str(tmp_path), _TableEmbeddings(vectors), refresh_interval=0)
+    approximate = SharedIndex(str(tmp_path), _TableEmbeddings(vectors), refresh_interval=0)
+    exact._state.base_index = None
+    loaded = approximate._state.base_index
+    assert isinstance(loaded.rows, np.memmap) and loaded.nlist == 44
+
+    recall = []
+    for query in range(0, 2000, 50):
+        expected = {doc.page_content for doc in exact.similarity_search(str(query), k=5)}
+        found = {doc.page_content for doc in approximate.similarity_search(str(query), k=5)}
+        recall.append(len(expected & found) / 5)
+    assert np.mean(recall) >= 0.9
+
+    # Consultas que pedem mais linhas do que as listas sondadas voltam a busca exata
+    approximate.nprobe = 1
+    assert len(approximate.similarity_search("0", k=1500)) == 1500
+
+    publisher.publish(_export([("a:0", [1.0] * 16, "texto", {})]))
+    assert all(not tmp_path.joinpath(name).exists() for name in index_paths(first).values())
+
+
+@pytest.fixture
+def writer_role(monkeypatch) -> None:
+    monkeypatch.setenv("RAG_ROLE", "writer")
+    # A publicacao e disparada pelo teste (flush_generation), nao pela thread
+    monkeypatch.setenv("RAG_GENERATION_INTERVAL_SECONDS", "3600")
+
+
+def test_writer_publishes_deltas_and_compacts(writer_role, engine, tmp_path) -> None:
+    generations = str(tmp_path / "generations")
+    disclaimer = "Documento confidencial de uso exclusivamente interno da empresa."
+    for doc_id, text in (("a", "Politica de ferias da filial de Campinas."), ("b", "Manual.")):
+        engine.index_documents(
+            [
+                {"text": text, "source": f"{doc_id}.pdf", "doc_id": doc_id},
+                {"text": disclaimer, "source": f"{doc_id}.pdf", "doc_id": doc_id},
+            ]
+        )
+    engine.flush_generation()
+    engine.delete_document("a")
+    engine.flush_generation()
+    chain = read_current_chain(generations)
+    engine.flush_generation()
+
+    assert len(chain) == 3 and all(name.endswith("-delta.ragsnap") for name in chain[1:])
+    assert read_current_chain(generations) == chain
+    reader = SharedIndex(generations, engine.embeddings, refresh_interval=0)
+    results = reader.similarity_search(disclaimer, k=5)
+    assert {doc.metadata["doc_id"] for doc in results} == {"b"}
+    assert len(results) == 2
+
+    engine.generation_max_deltas = 2
+    engine.index_documents([{"text": "Relatorio de vendas.", "source": "c.pdf", "doc_id": "c"}])
+    engine.flush_generation()
+
+    [compacted] = read_current_chain(generations)
+    assert not compacted.endswith("-delta.ragsnap")
+    assert len(reader.similarity_search("Relatorio de vendas.", k=5)) == 3
+
+
+def test_writer_publishes_deltas_without_rehashing_the_chain(
+    writer_role, monkeypatch, engine, tmp_path
+) -> None:
+    verified = []
+    verify = IndexSnapshot.verify
+
+    def counting(snapshot):
+        verified.append(snapshot.path)
+        verify(snapshot)
+
+    monkeypatch.setattr(IndexSnapshot, "verify", counting)
+    for doc_id in "abc":
+        engine.index_documents([{"text": f"Manual {doc_id}.", "source": "m.pdf", "doc_id": doc_id}])
+        engine.flush_generation()
+
+    chain = read_current_chain(str(tmp_path / "generations"))
+    assert len(chain) == 4
+    assert verified == []
+
+
+def test_writer_builds_ivf_index_for_large_generations(
+    writer_role, monkeypatch, engine, tmp_path
+) -> None:
+    generations = tmp_path / "generations"
+    engine.generation_max_deltas = 0
+    engine.index_documents([{"text": "Manual.", "source": "a.pdf", "doc_id": "a"}])
+    engine.flush_generation()
+    [small] = read_current_chain(str(generations))
+    assert IVFIndex.load(str(generations / small)) is None
+
+    engine.ann_min_vectors = 2
+    engine.index_documents([{"text": "Relatorio de vendas.", "source": "b.pdf", "doc_id": "b"}])
+    engine.flush_generation()
+    [large] = read_current_chain(str(generations))
+    index = IVFIndex.load(str(generations / large))
+    assert index is not None and sorted(index.rows.tolist()) == [0, 1]
+
+
+def test_writer_publishes_in_the_background(monkeypatch, tmp_path, fake_store) -> None:
+    monkeypatch.setenv("RAG_ROLE", "writer")
+    monkeypatch.setenv("RAG_GENERATION_INTERVAL_SECONDS", "0.05")
+    monkeypatch.setenv("RAG_DATA_DIR", str(tmp_path))
+    from backend.core.rag_engine import RAGEngine
+
+    engine = RAGEngine()
+    engine.vectorstore = fake_store
+    try:
+        engine.index_documents([{"text": "Manual.", "source": "a.pdf", "doc_id": "a"}])
+        deadline = time.monotonic() + 5
+        while len(read_current_chain(str(tmp_path / "generations"))) < 2:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+    finally:
+        engine.close()